@@ -0,0 +1,23 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, Response
+from src.backend.app.dependencies import deps
+
+router = APIRouter()
+
+# blobs are content-addressed, so a name always refers to the same bytes
+CACHE_HEADERS = {"Cache-Control": "public, max-age=31536000, immutable"}
+
+
+@router.get("/images/{name}")
+async def get_image(name: str, request: Request):
+    path = deps.blob_store.get_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    etag = f'"{name.split(".")[0]}"'
+    headers = {**CACHE_HEADERS, "ETag": etag}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    # FileResponse answers Range requests with 206 partial content
+    return FileResponse(path, headers=headers)
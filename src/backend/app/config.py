@@ -1,12 +1,52 @@
+from typing import Literal, Optional
 from pydantic_settings import BaseSettings
 
 
 class Settings(BaseSettings):
     llm_model: str = "gpt-4.1"
+    summary_model: str = "gpt-4.1-mini"
+    context_token_budget: int = 4000
     vton_model: str = "gemini-3-pro-image-preview"
     qdrant_url: str = "http://localhost:6333"
+    qdrant_grpc_port: int = 6334
+    qdrant_prefer_grpc: bool = False
+    qdrant_timeout: int = 10
+    qdrant_pool_size: Optional[int] = None
+    retrieval_backend: Literal["qdrant", "local"] = "qdrant"
+    local_index_path: Optional[str] = None
+    label_filtering: bool = True
+    wardrobe_labels: Optional[list[str]] = None
+    outfit_index_path: Optional[str] = None
     collection_name: str = "ctl_dataset_train_sample_500"
     clip_model_name: str = "patrickjohncyh/fashion-clip"
+    clip_device: str = "auto"
+    clip_text_backend: Literal["torch", "torchscript_int8"] = "torch"
+    clip_num_threads: Optional[int] = None
+    clip_executor_workers: int = 2
+    text_embedding_cache_size: int = 10000
+    text_embedding_vocab_path: Optional[str] = None
+    text_embedding_batching: bool = True
+    text_embedding_max_batch_size: int = 64
+    text_embedding_max_wait_ms: float = 5.0
+    image_embedding_cache_size: int = 2048
+    image_fetch_timeout: float = 10.0
+    image_fetch_pool_size: int = 16
+    image_cache_max_bytes: int = 256 * 1024 * 1024
+    image_decoded_cache_max_bytes: int = 128 * 1024 * 1024
+    image_disk_cache_dir: Optional[str] = None
+    image_prep_max_edge: int = 1024
+    image_prep_format: Literal["jpeg", "webp"] = "jpeg"
+    image_prep_quality: int = 85
+    image_prep_cache_max_bytes: int = 64 * 1024 * 1024
+    blob_store_dir: str = "./data/blobs"
+    session_backend: Literal["memory", "sqlite", "redis"] = "memory"
+    session_ttl_seconds: float = 86400
+    session_max_sessions: int = 10000
+    session_sqlite_path: str = "./data/sessions.db"
+    session_redis_url: str = "redis://localhost:6379/0"
+    qdrant_hnsw_ef: Optional[int] = None
+    qdrant_quantization_rescore: bool = True
+    qdrant_quantization_oversampling: Optional[float] = None
     openai_api_key: str
     google_api_key: str
 
@@ -1,16 +1,34 @@
-from qdrant_client import QdrantClient
+from concurrent.futures import ThreadPoolExecutor
 from transformers import CLIPModel, CLIPProcessor
 from src.backend.app.services.session import SessionManager
 from src.backend.app.prompt_manager import PromptManager
+from src.backend.app.services.blob_store import BlobStore
+from src.backend.app.services.context import ContextManager
+from src.backend.app.services.embedding import EmbeddingLRU, MicroBatcher
+from src.backend.app.services.clip import QuantizedCLIPTextEncoder
+from src.backend.app.services.outfit import OutfitIndex
+from src.backend.app.services.vector_store import VectorStore
+from src.backend.app.utils.image_utils import ImageFetcher, ImagePreparer
 
 
 class AppDependencies:
     """Container for application-wide dependencies."""
-    qdrant_client: QdrantClient | None = None
+    vector_store: VectorStore | None = None
+    wardrobe_labels: list[str] | None = None
+    outfit_index: OutfitIndex | None = None
     clip_model: CLIPModel | None = None
     clip_processor: CLIPProcessor | None = None
+    clip_text_model: CLIPModel | QuantizedCLIPTextEncoder | None = None
+    clip_executor: ThreadPoolExecutor | None = None
     session_manager: SessionManager | None = None
     prompt_manager: PromptManager | None = None
+    context_manager: ContextManager | None = None
+    text_embedding_cache: EmbeddingLRU | None = None
+    text_embedding_batcher: MicroBatcher | None = None
+    image_embedding_cache: EmbeddingLRU | None = None
+    image_fetcher: ImageFetcher | None = None
+    image_preparer: ImagePreparer | None = None
+    blob_store: BlobStore | None = None
 
 
 deps = AppDependencies()
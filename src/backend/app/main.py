@@ -1,32 +1,112 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
+from functools import partial
 from fastapi import FastAPI, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 
 from src.backend.app.dependencies import deps
 from src.backend.app.config import settings
-from qdrant_client import QdrantClient
-from transformers import CLIPModel, CLIPProcessor
+from src.backend.app.services.clip import load_clip_model, load_text_encoder
 from src.backend.app.services.session import SessionManager
+from src.backend.app.services.session_store import create_session_store
+from src.backend.app.services.blob_store import BlobStore
+from src.backend.app.api.routes import images
 from src.backend.app.models.schemas import ChatRequest, SessionDataResponse
 from src.backend.app.services.graph import invoke_graph
+from src.backend.app.services.embedding import EmbeddingLRU, MicroBatcher
+from src.backend.app.services.retrieval import encode_texts, get_text_features, warm_text_embedding_cache
+from src.backend.app.services.outfit import OutfitIndex
+from src.backend.app.services.vector_store import VectorStore, create_vector_store
 from src.backend.app.prompt_manager import PromptManager
+from src.backend.app.services.context import ContextManager
+from src.backend.app.utils.image_utils import ImageFetcher, ImagePreparer
+
+logger = logging.getLogger(__name__)
+
+
+async def load_wardrobe_labels() -> list[str] | None:
+    """The label names used to filter search, or None to search unfiltered."""
+    if not settings.label_filtering:
+        return None
+    if settings.wardrobe_labels:
+        return settings.wardrobe_labels
+    try:
+        # facets need a keyword index on label, which older collections lack
+        return await deps.vector_store.get_labels()
+    except Exception:
+        logger.exception("Failed to load wardrobe labels, searching without label filters")
+        return None
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    deps.qdrant_client = QdrantClient(url=settings.qdrant_url)
-    deps.clip_model = CLIPModel.from_pretrained(settings.clip_model_name).cuda()
-    deps.clip_processor = CLIPProcessor.from_pretrained(settings.clip_model_name)
-    deps.session_manager = SessionManager()
+    deps.vector_store = create_vector_store()
+    deps.wardrobe_labels = await load_wardrobe_labels()
+    if settings.outfit_index_path:
+        deps.outfit_index = OutfitIndex(settings.outfit_index_path)
+    deps.clip_model, deps.clip_processor = load_clip_model(
+        settings.clip_model_name,
+        device=settings.clip_device,
+        num_threads=settings.clip_num_threads,
+    )
+    deps.clip_text_model = load_text_encoder(deps.clip_model, deps.clip_processor, backend=settings.clip_text_backend)
+    # CLIP is CPU / GPU bound, so a few workers are enough and more would only contend for the model
+    deps.clip_executor = ThreadPoolExecutor(max_workers=settings.clip_executor_workers, thread_name_prefix="clip")
+    deps.session_manager = SessionManager(create_session_store())
     deps.prompt_manager = PromptManager()
+    deps.context_manager = ContextManager(
+        model=settings.llm_model,
+        summary_model=settings.summary_model,
+        token_budget=settings.context_token_budget,
+        summary_prompt=deps.prompt_manager.get_prompt("summarizer"),
+        max_sessions=settings.session_max_sessions,
+    )
+    deps.text_embedding_cache = EmbeddingLRU(max_size=settings.text_embedding_cache_size)
+    deps.image_embedding_cache = EmbeddingLRU(max_size=settings.image_embedding_cache_size)
+    deps.blob_store = BlobStore(settings.blob_store_dir)
+    deps.image_fetcher = ImageFetcher(
+        timeout=settings.image_fetch_timeout,
+        pool_size=settings.image_fetch_pool_size,
+        memory_cache_bytes=settings.image_cache_max_bytes,
+        decoded_cache_bytes=settings.image_decoded_cache_max_bytes,
+        disk_cache_dir=settings.image_disk_cache_dir,
+        blob_store=deps.blob_store,
+    )
+    deps.image_preparer = ImagePreparer(
+        deps.image_fetcher,
+        max_edge=settings.image_prep_max_edge,
+        image_format=settings.image_prep_format,
+        quality=settings.image_prep_quality,
+        cache_bytes=settings.image_prep_cache_max_bytes,
+    )
+    if settings.text_embedding_vocab_path:
+        warm_text_embedding_cache(deps.clip_text_model, deps.clip_processor, settings.text_embedding_vocab_path)
+    if settings.label_filtering and deps.wardrobe_labels:
+        get_text_features(deps.clip_text_model, deps.clip_processor, deps.wardrobe_labels)
+    if settings.text_embedding_batching:
+        deps.text_embedding_batcher = MicroBatcher(
+            partial(encode_texts, deps.clip_text_model, deps.clip_processor),
+            max_batch_size=settings.text_embedding_max_batch_size,
+            max_wait_ms=settings.text_embedding_max_wait_ms,
+        )
 
     yield
 
-    deps.qdrant_client.close()
+    if deps.text_embedding_batcher is not None:
+        deps.text_embedding_batcher.close()
+    await deps.context_manager.close()
+    deps.image_fetcher.close()
+    deps.clip_executor.shutdown(wait=False, cancel_futures=True)
+    deps.session_manager.close()
+    await deps.vector_store.close()
 
 
 app = FastAPI(lifespan=lifespan)
 
+app.include_router(images.router)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000"],
@@ -36,26 +116,41 @@ app.add_middleware(
 )
 
 
-def get_qdrant_client() -> QdrantClient:
-    return deps.qdrant_client
+def get_vector_store() -> VectorStore:
+    return deps.vector_store
 
 
 def get_clip_model():
-    return deps.clip_model, deps.clip_processor
+    return deps.clip_text_model, deps.clip_processor
 
 
 @app.post("/chat")
 async def chat(
         request: ChatRequest,
-        qdrant_client: QdrantClient = Depends(get_qdrant_client),
+        vector_store: VectorStore = Depends(get_vector_store),
         clip: tuple = Depends(get_clip_model),
 ):
-    return invoke_graph(request, qdrant_client, clip)
+    return await invoke_graph(request, vector_store, clip)
+
+
+@app.get("/metrics")
+async def get_metrics():
+    return {
+        "text_embedding_cache": deps.text_embedding_cache.stats(),
+        "text_embedding_batcher": deps.text_embedding_batcher.stats() if deps.text_embedding_batcher else None,
+        "image_embedding_cache": deps.image_embedding_cache.stats(),
+        "outfit_index": deps.outfit_index.stats() if deps.outfit_index else None,
+        "image_fetcher": deps.image_fetcher.stats(),
+        "image_preparer": deps.image_preparer.stats(),
+        "blob_store": deps.blob_store.stats(),
+        "session_store": await asyncio.to_thread(deps.session_manager.stats),
+        "conversation_context": deps.context_manager.stats(),
+    }
 
 
 @app.get("/session/{session_id}")
 async def get_session(session_id: str):
-    session_data = deps.session_manager.get_session_data(session_id)
+    session_data = await asyncio.to_thread(deps.session_manager.get_session_data, session_id)
     if session_data is None:
         raise HTTPException(status_code=404, detail="Session not found")
 
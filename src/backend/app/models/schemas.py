@@ -17,7 +17,7 @@ class ImageSource(BaseModel):
     @field_validator("path")
     @classmethod
     def validate_path(cls, v: str) -> str:
-        if v.startswith("data:image"):
+        if v.startswith("data:image") or v.startswith("blob://"):
             return v
 
         url_scheme = urlparse(v)
@@ -28,6 +28,22 @@ class ImageSource(BaseModel):
         raise ValueError(f"Path must be a valid URL or local file path: {v}")
 
 
+class PreparedImage(BaseModel):
+    """An image re-encoded for upload to an LLM or VTON provider."""
+    data: bytes = Field(..., description="The encoded image bytes.")
+    mime_type: str = Field(..., description="MIME type of the encoded bytes.")
+    original_bytes: int = Field(..., description="Size of the uncompressed, full-resolution crop in bytes.")
+
+
+# Retrieval
+class RetrievedItem(BaseModel):
+    """A wardrobe item returned by vector search."""
+    image_source: ImageSource = Field(..., description="The image of the item.")
+    score: float = Field(..., description="Similarity score of the item to the query.")
+    label: Optional[str] = Field(default=None, description="Category label of the item.")
+    point_id: Optional[str] = Field(default=None, description="Id of the item's point in the wardrobe collection.")
+
+
 # Descriptor
 class ItemDescription(BaseModel):
     item_name: str = Field(..., description="Name of the item.")
@@ -60,7 +76,7 @@ class ToolCall(BaseModel):
 
 class ImageResult(BaseModel):
     image_id: str = Field(..., description="The id of the image.")
-    url: Optional[str] = Field(default=None, description="The url or path of the image.")
+    url: Optional[str] = Field(default=None, description="The url or path of the image; stored images are served from /images.")
     bbox: Optional[Tuple[float, float, float, float]] = Field(default=None, description="The bounding box of the item in the image.")
     type: Literal["user_provided", "retrieved", "virtual_try_on"] = Field(..., description="The type of the image.")
 
@@ -18,6 +18,7 @@ class PromptManager:
             self._prompts["descriptor"] = self.client.pull_prompt(url_template.format(agent="descriptor"))
             self._prompts["recommender"] = self.client.pull_prompt(url_template.format(agent="recommender"))
             self._prompts["vton"] = self.client.pull_prompt(url_template.format(agent="vton"))
+            self._prompts["summarizer"] = self.client.pull_prompt(url_template.format(agent="summarizer"))
         except Exception as e:
             raise ValueError(f"Failed to load prompts: {e}")
 
@@ -2,7 +2,7 @@ from langsmith import traceable, get_current_run_tree
 from src.backend.app.models.schemas import AgentResponse, State
 from jinja2 import Template
 import instructor
-from litellm import completion
+from litellm import acompletion
 from langchain_core.messages import convert_to_openai_messages
 from src.backend.app.utils.utils import format_ai_message
 from src.backend.app.config import settings
@@ -17,14 +17,9 @@ from src.backend.app.dependencies import deps
         "ls_model_name": settings.llm_model
     },
 )
-def agent_node(state: State) -> dict:
+async def agent_node(state: State) -> dict:
 
-    # prompt_template = deps.prompt_manager.get_prompt("agent")
-    # FOR DEBUGGING ONLY
-    import yaml
-    agent_prompt_path = "/home/farrosalferro/projects/fashion_recommender/prompts/agent.yaml"
-    with open(agent_prompt_path, "r") as file:
-        prompt_template = yaml.safe_load(file)["prompt"]
+    prompt_template = deps.prompt_manager.get_prompt("agent")
 
     template = Template(prompt_template)
 
@@ -36,8 +31,8 @@ def agent_node(state: State) -> dict:
     for message in messages:
         conversations.append(convert_to_openai_messages(message))
 
-    client = instructor.from_litellm(completion)
-    response, raw_response = client.chat.completions.create_with_completion(
+    client = instructor.from_litellm(acompletion)
+    response, raw_response = await client.chat.completions.create_with_completion(
         model=settings.llm_model,
         response_model=AgentResponse,
         messages=[{
@@ -0,0 +1,82 @@
+import base64
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+from typing import Optional
+
+BLOB_SCHEME = "blob://"
+BLOB_NAME_PATTERN = re.compile(r"^[0-9a-f]{64}\.[a-z0-9]+$")
+
+
+def is_blob_ref(path: str) -> bool:
+    return path.startswith(BLOB_SCHEME)
+
+
+class BlobStore:
+    """Content-addressed store for uploaded and generated images on local disk.
+
+    A blob is saved once as ``<root>/<digest[:2]>/<digest>.<ext>`` no matter how
+    many sessions reference it; sessions only keep the ``blob://<digest>.<ext>``
+    reference, which the ``/images`` route serves.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self.writes = 0
+        self.dedup_hits = 0
+        self.bytes_written = 0
+
+    def _get_path(self, name: str) -> str:
+        return os.path.join(self.root, name[:2], name)
+
+    def put(self, data: bytes, mime_type: str) -> str:
+        """Store ``data`` and return its ``blob://`` reference."""
+        extension = (mimetypes.guess_extension(mime_type) or ".bin").lstrip(".")
+        name = f"{hashlib.sha256(data).hexdigest()}.{extension}"
+        path = self._get_path(name)
+        if os.path.exists(path):
+            with self._lock:
+                self.dedup_hits += 1
+            return BLOB_SCHEME + name
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as file:
+            file.write(data)
+        os.replace(temp_path, path)
+        with self._lock:
+            self.writes += 1
+            self.bytes_written += len(data)
+        return BLOB_SCHEME + name
+
+    def put_data_url(self, data_url: str) -> str:
+        header, encoded = data_url.split(",", 1)
+        mime_type = header.removeprefix("data:").split(";")[0]
+        return self.put(base64.b64decode(encoded), mime_type)
+
+    def get_path(self, ref: str) -> Optional[str]:
+        """Return the file behind a reference (or bare blob name), or None if it is unknown."""
+        name = ref.removeprefix(BLOB_SCHEME)
+        if not BLOB_NAME_PATTERN.match(name):
+            return None
+        path = self._get_path(name)
+        return path if os.path.exists(path) else None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "writes": self.writes,
+                "dedup_hits": self.dedup_hits,
+                "bytes_written": self.bytes_written,
+            }
+
+
+def get_image_url(path: str) -> str:
+    """The URL a client should load an image source from."""
+    if is_blob_ref(path):
+        return f"/images/{path.removeprefix(BLOB_SCHEME)}"
+    return path
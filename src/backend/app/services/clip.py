@@ -0,0 +1,85 @@
+import copy
+from typing import Optional
+import torch
+from torch import nn
+from transformers import CLIPModel, CLIPProcessor
+
+
+def resolve_device(device: str = "auto") -> torch.device:
+    if device == "auto":
+        return torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    return torch.device(device)
+
+
+def load_clip_model(
+    model_name: str,
+    device: str = "auto",
+    num_threads: Optional[int] = None,
+) -> tuple[CLIPModel, CLIPProcessor]:
+    if num_threads is not None:
+        torch.set_num_threads(num_threads)
+
+    model = CLIPModel.from_pretrained(model_name).to(resolve_device(device)).eval()
+    processor = CLIPProcessor.from_pretrained(model_name)
+    return model, processor
+
+
+class CLIPTextTower(nn.Module):
+    """The text half of CLIP, as a standalone module that can be traced."""
+
+    def __init__(self, model: CLIPModel):
+        super().__init__()
+        self.text_model = model.text_model
+        self.text_projection = model.text_projection
+
+    def forward(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+        pooled_output = self.text_model(input_ids=input_ids, attention_mask=attention_mask)[1]
+        return self.text_projection(pooled_output)
+
+
+class QuantizedCLIPTextEncoder:
+    """CPU text encoder: int8 dynamically quantized, TorchScript-traced text tower.
+
+    Exposes ``get_text_features`` and ``device`` like ``CLIPModel`` so it can be
+    used wherever the full model encodes text. Inputs are padded to the
+    tokenizer's maximum length because the trace is specialised to that shape.
+    """
+
+    def __init__(self, model: CLIPModel, processor: CLIPProcessor):
+        self.device = torch.device("cpu")
+        self.max_length = processor.tokenizer.model_max_length
+        self.pad_token_id = processor.tokenizer.pad_token_id
+
+        tower = CLIPTextTower(copy.deepcopy(model).cpu().float()).eval()
+        quantized = torch.ao.quantization.quantize_dynamic(tower, {nn.Linear}, dtype=torch.qint8)
+
+        example = processor.tokenizer(
+            text=["a photo of a fashion item"],
+            return_tensors="pt",
+            padding="max_length",
+            max_length=self.max_length,
+        )
+        with torch.no_grad():
+            self.module = torch.jit.trace(quantized, (example["input_ids"], example["attention_mask"]), strict=False)
+
+    def _pad(self, tensor: torch.Tensor, value: int) -> torch.Tensor:
+        return nn.functional.pad(tensor, (0, self.max_length - tensor.shape[1]), value=value)
+
+    def get_text_features(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+        input_ids = self._pad(input_ids.cpu(), self.pad_token_id)
+        attention_mask = self._pad(attention_mask.cpu(), 0)
+        with torch.no_grad():
+            return self.module(input_ids, attention_mask)
+
+
+def load_text_encoder(
+    model: CLIPModel,
+    processor: CLIPProcessor,
+    backend: str = "torch",
+) -> CLIPModel | QuantizedCLIPTextEncoder:
+    """Return the module used to embed text queries for the configured backend."""
+    if backend == "torch":
+        return model
+    if backend == "torchscript_int8":
+        return QuantizedCLIPTextEncoder(model, processor)
+    raise ValueError(f"Unknown CLIP text backend: {backend}")
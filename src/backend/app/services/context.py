@@ -0,0 +1,188 @@
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any
+import numpy as np
+from jinja2 import Template
+from litellm import acompletion, token_counter
+from src.backend.app.models.schemas import MessageHistory
+from src.backend.app.utils.utils import load_message_history_for_llm
+
+logger = logging.getLogger(__name__)
+
+
+class ConversationContext:
+    """LLM-ready history of one session, converted and token-counted once per message."""
+
+    def __init__(self):
+        self.messages: list[dict[str, Any]] = []
+        self.token_counts: list[int] = []
+        self.summary: str = ""
+        self.summary_tokens: int = 0
+        # messages [0, summarized_upto) are covered by the summary
+        self.summarized_upto: int = 0
+        # messages [0, window_start) did not fit the last window
+        self.window_start: int = 0
+        self.summarizing: bool = False
+
+
+class ContextManager:
+    """Token-budgeted agent context: a sliding window of recent turns plus a rolling summary.
+
+    Stored history is converted with ``load_message_history_for_llm`` only for
+    messages not seen before, so each turn costs a conversion of the new tail.
+    Turns that slide out of the window are folded into the summary by a
+    background task scheduled after the turn, never on the request path; until
+    it finishes the window simply starts later.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        summary_model: str,
+        summary_prompt: str,
+        token_budget: int = 4000,
+        summary_max_words: int = 200,
+        max_sessions: int = 10000,
+    ):
+        self.model = model
+        self.summary_model = summary_model
+        self.token_budget = token_budget
+        self.summary_max_words = summary_max_words
+        self.max_sessions = max_sessions
+        self.summary_template = Template(summary_prompt)
+
+        self._contexts: OrderedDict[str, ConversationContext] = OrderedDict()
+        self._lock = threading.Lock()
+        self._tasks: set[asyncio.Task] = set()
+        self.turns = 0
+        self.tokens_sent = 0
+        self.tokens_saved = 0
+        self.summaries = 0
+        self.summary_failures = 0
+        self.turn_latencies_ms: list[float] = []
+
+    def _get_context(self, session_id: str) -> ConversationContext:
+        with self._lock:
+            context = self._contexts.get(session_id)
+            if context is None:
+                context = self._contexts[session_id] = ConversationContext()
+                while len(self._contexts) > self.max_sessions:
+                    self._contexts.popitem(last=False)
+            self._contexts.move_to_end(session_id)
+            return context
+
+    def count_tokens(self, messages: list[dict[str, Any]]) -> int:
+        return token_counter(model=self.model, messages=messages)
+
+    def build(self, session_id: str, message_history: list[MessageHistory]) -> tuple[list[dict[str, Any]], dict]:
+        """Return the messages to send for this turn and a report of the tokens they cost.
+
+        ``message_history`` is the stored history; only the messages the cached
+        context has not seen yet are converted, so histories appended by another
+        worker are picked up too.
+        """
+        context = self._get_context(session_id)
+        if len(message_history) < len(context.messages):
+            # the session was reset or evicted and recreated; a summary still running
+            # for the old context sees it was replaced and drops its result
+            with self._lock:
+                context = self._contexts[session_id] = ConversationContext()
+        for message in message_history[len(context.messages):]:
+            converted = load_message_history_for_llm(message)
+            context.messages.append(converted)
+            context.token_counts.append(self.count_tokens([converted]))
+
+        # walk back from the newest turn while it fits, keeping user / assistant pairs together
+        budget = self.token_budget - context.summary_tokens
+        start = len(context.messages)
+        used = 0
+        while start >= 2 and used + context.token_counts[start - 2] + context.token_counts[start - 1] <= budget:
+            used += context.token_counts[start - 2] + context.token_counts[start - 1]
+            start -= 2
+        context.window_start = start
+
+        messages = context.messages[start:]
+        if start > 0 and context.summary:
+            messages = [{"role": "system", "content": f"Summary of the earlier conversation:\n{context.summary}"}, *messages]
+            used += context.summary_tokens
+
+        full_tokens = sum(context.token_counts)
+        report = {
+            "history_messages": len(context.messages),
+            "window_messages": len(context.messages) - start,
+            "summarized_messages": context.summarized_upto,
+            "context_tokens": used,
+            "history_tokens": full_tokens,
+            "tokens_saved": max(full_tokens - used, 0),
+        }
+        return messages, report
+
+    def record_turn(self, report: dict, latency_ms: float, iterations: int = 1) -> None:
+        """Account one finished turn; the context is resent on every agent iteration."""
+        with self._lock:
+            self.turns += 1
+            self.tokens_sent += report["context_tokens"] * iterations
+            self.tokens_saved += report["tokens_saved"] * iterations
+            self.turn_latencies_ms.append(latency_ms)
+            self.turn_latencies_ms = self.turn_latencies_ms[-1000:]
+
+    def schedule_summary(self, session_id: str) -> None:
+        """Fold turns that left the window into the summary, in a background task."""
+        context = self._get_context(session_id)
+        if context.summarizing or context.window_start <= context.summarized_upto:
+            return
+        context.summarizing = True
+        task = asyncio.get_running_loop().create_task(self._summarize(session_id, context, context.window_start))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _summarize(self, session_id: str, context: ConversationContext, upto: int) -> None:
+        try:
+            prompt = self.summary_template.render(
+                summary=context.summary,
+                messages=context.messages[context.summarized_upto:upto],
+                max_words=self.summary_max_words,
+            )
+            response = await acompletion(
+                model=self.summary_model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0,
+            )
+            summary = response.choices[0].message.content.strip()
+            with self._lock:
+                if self._contexts.get(session_id) is not context:
+                    # the session was reset or evicted while summarizing
+                    return
+            context.summary_tokens = self.count_tokens([{"role": "system", "content": summary}])
+            context.summary = summary
+            context.summarized_upto = upto
+            with self._lock:
+                self.summaries += 1
+        except Exception:
+            # the summary is best effort; the window alone still bounds the context
+            logger.exception("Failed to summarize conversation history")
+            with self._lock:
+                self.summary_failures += 1
+        finally:
+            context.summarizing = False
+
+    def stats(self) -> dict:
+        with self._lock:
+            latencies = self.turn_latencies_ms
+            return {
+                "sessions": len(self._contexts),
+                "turns": self.turns,
+                "tokens_sent": self.tokens_sent,
+                "tokens_saved": self.tokens_saved,
+                "summaries": self.summaries,
+                "summary_failures": self.summary_failures,
+                "turn_latency_p50_ms": float(np.percentile(latencies, 50)) if latencies else None,
+                "turn_latency_p95_ms": float(np.percentile(latencies, 95)) if latencies else None,
+            }
+
+    async def close(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
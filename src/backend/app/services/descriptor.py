@@ -1,20 +1,23 @@
+import asyncio
 import instructor
-from litellm import completion
+from litellm import acompletion
 from langsmith import traceable, get_current_run_tree
 from instructor.processing import multimodal
 from jinja2 import Template
-from src.backend.app.models.schemas import DescriptorAgentResponse, ItemDescription
+from langchain_core.runnables import RunnableConfig
+from src.backend.app.models.schemas import DescriptorAgentResponse, ImageSource, ItemDescription, PreparedImage
 from src.backend.app.config import settings
 from src.backend.app.dependencies import deps
+from src.backend.app.utils.image_utils import bytes_to_base64_data_url, get_payload_report
 
 
-def format_image_list(image_id_list: list[str], session_id: str) -> dict[str, str]:
+def format_image_list(image_id_list: list[str], session_id: str) -> dict[str, ImageSource]:
     """Format the image list for the descriptor agent."""
-    return {image_id: deps.session_manager.get_image_source(session_id, image_id) for image_id in image_id_list}
+    return dict(zip(image_id_list, deps.session_manager.get_image_sources(session_id, image_id_list)))
 
 
-def process_images(image_url: str):
-    image = multimodal.Image.from_url(image_url)
+def process_images(prepared_image: PreparedImage):
+    image = multimodal.Image.from_base64(bytes_to_base64_data_url(prepared_image.data, prepared_image.mime_type))
     return image
 
 
@@ -26,20 +29,24 @@ def process_images(image_url: str):
         "ls_model_name": settings.llm_model
     },
 )
-def descriptor_agent(image_list: dict[str, str]):
+async def descriptor_agent(image_list: dict[str, ImageSource]):
     prompt_template = deps.prompt_manager.get_prompt("descriptor")
 
     template = Template(prompt_template)
 
     prompt = [template.render()]
 
-    for image_id, image_info in image_list.items():
+    prepared_images = await asyncio.gather(*[
+        asyncio.to_thread(deps.image_preparer.prepare, image_info.path, image_info.bbox)
+        for image_info in image_list.values()
+    ])
+    for image_id, prepared_image in zip(image_list, prepared_images):
         prompt.append(image_id)
-        prompt.append(process_images(image_info.path))
+        prompt.append(process_images(prepared_image))
 
-    client = instructor.from_litellm(completion)
+    client = instructor.from_litellm(acompletion)
 
-    response, raw_response = client.chat.completions.create_with_completion(
+    response, raw_response = await client.chat.completions.create_with_completion(
         model=settings.llm_model,
         messages=[{
             "role": "user",
@@ -57,6 +64,7 @@ def descriptor_agent(image_list: dict[str, str]):
             "output_tokens": raw_response.usage.completion_tokens,
             "total_tokens": raw_response.usage.total_tokens
         }
+        current_run.metadata["image_payload"] = get_payload_report(prepared_images)
 
     return response.item_descriptions
 
@@ -79,21 +87,17 @@ def parse_item_descriptions(item_descriptions: dict[str, ItemDescription]) -> st
     return "\n".join(output_parts)
 
 
-def create_get_item_descriptions(session_id: str):
+async def get_item_descriptions(image_id_list: list[str], config: RunnableConfig = None) -> str:
+    """Get descriptions for a list of images.
 
-    def get_item_descriptions(image_id_list: list[str]) -> str:
-        """Get descriptions for a list of images.
+    Args:
+        image_id_list: The list of image ids to get descriptions from.
 
-        Args:
-            image_id_list: The list of image ids to get descriptions from.
+    Returns:
+        A string of the item descriptions.
+    """
 
-        Returns:
-            A string of the item descriptions.
-        """
-
-        image_dict = format_image_list(image_id_list, session_id)
-        item_descriptions = descriptor_agent(image_dict)
-        formatted_item_descriptions = parse_item_descriptions(item_descriptions)
-        return formatted_item_descriptions
-
-    return get_item_descriptions
+    image_dict = await asyncio.to_thread(format_image_list, image_id_list, config["configurable"]["session_id"])
+    item_descriptions = await descriptor_agent(image_dict)
+    formatted_item_descriptions = parse_item_descriptions(item_descriptions)
+    return formatted_item_descriptions
@@ -0,0 +1,110 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Optional
+import numpy as np
+from src.backend.app.utils.lru import LRUCache
+
+
+def normalize_text(text: str) -> str:
+    """Normalize a query phrase so trivially different spellings share a cache entry."""
+    return " ".join(text.lower().split())
+
+
+class EmbeddingLRU(LRUCache):
+    """Thread-safe LRU cache of embedding vectors, bounded by the number of vectors."""
+
+    def __init__(self, max_size: int = 10000):
+        super().__init__(max_size, sizeof=lambda vector: 1)
+
+
+class MicroBatcher:
+    """Coalesce concurrent embedding requests into shared forward passes.
+
+    A worker thread takes the first waiting request, then keeps collecting
+    requests for up to ``max_wait_ms`` or until ``max_batch_size`` inputs are
+    gathered, runs ``encode_fn`` once and hands every caller its slice of the
+    result.
+    """
+
+    def __init__(
+        self,
+        encode_fn: Callable[[list[Any]], np.ndarray],
+        max_batch_size: int = 64,
+        max_wait_ms: float = 5.0,
+    ):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._requests: queue.Queue[Optional[tuple[list[Any], Future]]] = queue.Queue()
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def submit(self, inputs: list[Any]) -> Future:
+        future = Future()
+        if not inputs:
+            future.set_result(np.empty((0, 0), dtype=np.float32))
+            return future
+        self._requests.put((list(inputs), future))
+        return future
+
+    def close(self) -> None:
+        self._requests.put(None)
+        self._worker.join()
+
+    def _collect(self, first: tuple[list[Any], Future]) -> tuple[list[tuple[list[Any], Future]], bool]:
+        batch = [first]
+        size = len(first[0])
+        deadline = time.perf_counter() + self.max_wait
+        while size < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                request = self._requests.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if request is None:
+                return batch, True
+            batch.append(request)
+            size += len(request[0])
+        return batch, False
+
+    def _run(self) -> None:
+        closed = False
+        while not closed:
+            first = self._requests.get()
+            if first is None:
+                return
+            batch, closed = self._collect(first)
+
+            inputs = [item for request_inputs, _ in batch for item in request_inputs]
+            try:
+                outputs = self.encode_fn(inputs)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            with self._lock:
+                self.batches += 1
+                self.items += len(inputs)
+
+            start = 0
+            for request_inputs, future in batch:
+                future.set_result(outputs[start:start + len(request_inputs)])
+                start += len(request_inputs)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "items": self.items,
+                "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+            }
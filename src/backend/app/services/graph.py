@@ -1,18 +1,31 @@
+import asyncio
+import time
 from langgraph.graph import StateGraph, START, END
 from langgraph.prebuilt import ToolNode
 from langchain_core.messages import AIMessage
 from src.backend.app.models.schemas import State
 from src.backend.app.dependencies import deps
-from src.backend.app.services.descriptor import create_get_item_descriptions
+from src.backend.app.services.descriptor import get_item_descriptions
 from src.backend.app.services.recommender import get_recommendations
-from src.backend.app.services.retrieval import create_retrieve_item_from_wardrobe
+from src.backend.app.services.retrieval import (
+    complete_the_look,
+    retrieve_item_from_wardrobe,
+    retrieve_similar_items_from_wardrobe,
+)
 from src.backend.app.services.search import search_item
-from src.backend.app.services.vton import create_virtual_try_on_image
-from src.backend.app.utils.utils import get_tool_descriptions, add_image_ids_to_message, load_message_history_for_llm
+from src.backend.app.services.vton import get_virtual_try_on_image
+from src.backend.app.utils.utils import get_tool_descriptions, add_image_ids_to_message
 from src.backend.app.services.agent import agent_node
 from src.backend.app.models.schemas import ChatRequest, ChatResponse, ImageResult, ImageSource
-from qdrant_client import QdrantClient
-from transformers import CLIPModel, CLIPProcessor
+from src.backend.app.services.vector_store import VectorStore
+from src.backend.app.services.blob_store import get_image_url
+
+
+def store_uploaded_image(image: str) -> str:
+    """Move inline (data URL) uploads into the blob store so sessions only keep a reference."""
+    if image.startswith("data:image"):
+        return deps.blob_store.put_data_url(image)
+    return image
 
 
 def tool_router(state: State) -> str:
@@ -28,23 +41,30 @@ def tool_router(state: State) -> str:
         return "end"
 
 
-def get_graph(
-    session_id: str,
-    model: CLIPModel,
-    processor: CLIPProcessor,
-    q_client: QdrantClient,
-) -> tuple[StateGraph, list[str]]:
+# tools take per-request state (session id, models, vector store) from the run config
+TOOLS = [
+    get_item_descriptions,
+    get_recommendations,
+    retrieve_item_from_wardrobe,
+    retrieve_similar_items_from_wardrobe,
+    search_item,
+    get_virtual_try_on_image,
+    complete_the_look,
+]
+TOOL_DESCRIPTIONS = get_tool_descriptions(TOOLS)
+
+
+def get_available_tool_descriptions() -> list[dict]:
+    """Descriptions of the tools this deployment can serve; complete_the_look needs an outfit index."""
+    if deps.outfit_index is not None:
+        return TOOL_DESCRIPTIONS
+    return [description for description in TOOL_DESCRIPTIONS if description["name"] != complete_the_look.__name__]
+
+
+def build_graph():
     workflow = StateGraph(State)
 
-    descriptor_tool = [
-        create_get_item_descriptions(session_id),
-        get_recommendations,
-        create_retrieve_item_from_wardrobe(session_id, model, processor, q_client),
-        search_item,
-        create_virtual_try_on_image(session_id),
-    ]
-    tool_node = ToolNode(descriptor_tool)
-    tool_descriptions = get_tool_descriptions(descriptor_tool)
+    tool_node = ToolNode(TOOLS)
 
     workflow.add_node("agent_node", agent_node)
     workflow.add_node("tool_node", tool_node)
@@ -60,47 +80,59 @@ def get_graph(
     )
     workflow.add_edge("tool_node", "agent_node")
 
-    graph = workflow.compile()
+    return workflow.compile()
+
+
+# compiled once; nothing in the graph depends on the request
+graph = build_graph()
+
 
-    return graph, tool_descriptions
+async def invoke_graph(
+    chat_request: ChatRequest,
+    vector_store: VectorStore,
+    clip: tuple,
+) -> dict:
+    session_id = await asyncio.to_thread(deps.session_manager.get_or_create_session, chat_request.session_id)
 
+    # turns of one session run one at a time, so none reads a history missing the previous turn
+    async with deps.session_manager.turn(session_id):
+        return await run_turn(chat_request, session_id, vector_store, clip)
 
-def invoke_graph(
+
+async def run_turn(
     chat_request: ChatRequest,
-    qdrant_client: QdrantClient,
+    session_id: str,
+    vector_store: VectorStore,
     clip: tuple,
 ) -> dict:
 
+    start = time.perf_counter()
     model, processor = clip
-    session_id = deps.session_manager.get_or_create_session(chat_request.session_id)
 
-    # load message history and previous image_ids
-    message_history = deps.session_manager.load_message_history(session_id)
-    updated_message_history = []
-    for message in message_history:
-        edited_message = load_message_history_for_llm(message)
-        updated_message_history.append(edited_message)
+    # load message history and previous image_ids, capped to the context token budget
+    message_history = await asyncio.to_thread(deps.session_manager.load_message_history, session_id)
+    updated_message_history, context_report = deps.context_manager.build(session_id, message_history)
 
     # converting image urls or local file paths to image ids
     user_provided_image_ids = []
     user_provided_images = []
     if chat_request.images:
         for i, image in enumerate(chat_request.images):
+            image = await asyncio.to_thread(store_uploaded_image, image)
             image_source = ImageSource(path=image, bbox=None)
-            user_provided_image_id = deps.session_manager.store_image_source(session_id, image_source)
+            user_provided_image_id = await asyncio.to_thread(deps.session_manager.store_image_source, session_id, image_source)
             user_provided_image_ids.append(user_provided_image_id)
             user_provided_images.append(ImageResult(
                 image_id=user_provided_image_id,
-                url=image,
+                url=get_image_url(image),
                 bbox=None,
                 type="user_provided",
             ))
 
     if chat_request.model_image:
-        model_image_source = ImageSource(path=chat_request.model_image, bbox=None)
-        model_image_id = deps.session_manager.store_image_source(session_id, model_image_source, is_model=True)
-
-    graph, tool_descriptions = get_graph(session_id, model, processor, qdrant_client)
+        model_image = await asyncio.to_thread(store_uploaded_image, chat_request.model_image)
+        model_image_source = ImageSource(path=model_image, bbox=None)
+        model_image_id = await asyncio.to_thread(deps.session_manager.store_image_source, session_id, model_image_source, True)
 
     # appending the image_ids to the query
     user_query = add_image_ids_to_message(chat_request.query, user_provided_image_ids, type="user_provided")
@@ -109,31 +141,51 @@ def invoke_graph(
     # initializing the state
     initial_state = {
         "messages": updated_message_history + [query],
-        "available_tools": tool_descriptions,
+        "available_tools": get_available_tool_descriptions(),
         "session_id": session_id,
     }
 
-    result = graph.invoke(initial_state)
+    config = {
+        "configurable": {
+            "session_id": session_id,
+            "vector_store": vector_store,
+            "clip_text_model": model,
+            "clip_processor": processor,
+            "clip_model": deps.clip_model,
+        }
+    }
+    result = await graph.ainvoke(initial_state, config=config)
 
     ai_result_images = result.get("images", [])
+    ai_image_sources = await asyncio.to_thread(
+        deps.session_manager.get_image_sources,
+        session_id,
+        [ai_result_image.image_id for ai_result_image in ai_result_images],
+    )
     ai_images = []
-    for ai_result_image in ai_result_images:
-        img_source = deps.session_manager.get_image_source(session_id, ai_result_image.image_id)
+    for ai_result_image, img_source in zip(ai_result_images, ai_image_sources):
         ai_images.append(ImageResult(
             image_id=ai_result_image.image_id,
-            url=img_source.path,
+            url=get_image_url(img_source.path),
             bbox=img_source.bbox,
             type=ai_result_image.type,
         ))
 
     # store the original messages
-    deps.session_manager.store_message(
+    await asyncio.to_thread(
+        deps.session_manager.store_message,
         session_id,
         user_query=chat_request.query,
         ai_response=result.get("answer", ""),
         user_images=user_provided_images if user_provided_images else None,
         ai_images=ai_images if ai_images else None,
     )
+    deps.context_manager.record_turn(
+        context_report,
+        latency_ms=(time.perf_counter() - start) * 1000,
+        iterations=result.get("iteration", 1),
+    )
+    deps.context_manager.schedule_summary(session_id)
 
     return ChatResponse(
         session_id=session_id,
@@ -0,0 +1,50 @@
+import json
+from src.backend.app.models.schemas import ImageSource, RetrievedItem
+
+
+class OutfitIndex:
+    """Outfit co-occurrence index written by ``utils/create_collection_ctl.py --outfit_index_path``.
+
+    Items that appear in the same source photo (same ``image_signature``) form an
+    outfit, so the items that go with a wardrobe point are a dictionary lookup.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "r") as file:
+            index = json.load(file)
+
+        self.collection_name = index["collection_name"]
+        self.points: dict[str, dict] = index["points"]
+        self.outfits: dict[str, list[str]] = index["outfits"]
+
+    def __len__(self) -> int:
+        return len(self.outfits)
+
+    def __contains__(self, point_id: str) -> bool:
+        return point_id in self.points
+
+    def get_outfit_mates(self, point_id: str) -> list[RetrievedItem]:
+        """Return the other items of the point's outfit, or an empty list for unknown points."""
+        point = self.points.get(point_id)
+        if point is None:
+            return []
+
+        mates = []
+        for mate_id in self.outfits[point["outfit"]]:
+            if mate_id == point_id:
+                continue
+            mate = self.points[mate_id]
+            mates.append(RetrievedItem(
+                image_source=ImageSource(path=mate["image_url"], bbox=mate["bbox"]),
+                score=1.0,
+                label=mate["label"],
+                point_id=mate_id,
+            ))
+        return mates
+
+    def stats(self) -> dict:
+        return {
+            "collection_name": self.collection_name,
+            "points": len(self.points),
+            "outfits": len(self.outfits),
+        }
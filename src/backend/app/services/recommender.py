@@ -1,5 +1,5 @@
 import instructor
-from litellm import completion
+from litellm import acompletion
 from langsmith import traceable, get_current_run_tree
 from jinja2 import Template
 from src.backend.app.models.schemas import StylistAgentResponse, FashionSet
@@ -22,15 +22,15 @@ def format_item_list(item_list: dict[str, str]) -> str:
         "ls_model_name": settings.llm_model
     },
 )
-def stylist_agent(user_intention: str, item_list: str = None):
+async def stylist_agent(user_intention: str, item_list: str = None):
     prompt_template = deps.prompt_manager.get_prompt("recommender")
 
     template = Template(prompt_template)
     prompt = template.render(user_intention=user_intention, item_list=item_list)
 
-    client = instructor.from_litellm(completion)
+    client = instructor.from_litellm(acompletion)
 
-    response, raw_response = client.chat.completions.create_with_completion(
+    response, raw_response = await client.chat.completions.create_with_completion(
         model=settings.llm_model,
         messages=[{
             "role": "user",
@@ -67,7 +67,7 @@ def parse_recommendations(recommendations: dict[str, FashionSet]) -> str:
     return "\n".join(output_parts)
 
 
-def get_recommendations(user_intention: str, item_list: dict[str, str] = None) -> str:
+async def get_recommendations(user_intention: str, item_list: dict[str, str] = None) -> str:
     """Get recommendations for a given query and item list from a fashion expert.
 
     Args:
@@ -79,6 +79,6 @@ def get_recommendations(user_intention: str, item_list: dict[str, str] = None) -
     """
 
     item_list = format_item_list(item_list)
-    recommendations = stylist_agent(user_intention, item_list)
+    recommendations = await stylist_agent(user_intention, item_list)
     parsed_recommendations = parse_recommendations(recommendations)
     return parsed_recommendations
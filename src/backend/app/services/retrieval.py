@@ -1,11 +1,37 @@
-from typing import List
+import asyncio
+from functools import partial
+from typing import List, Optional
+from itertools import batched
+import numpy as np
 from torch import torch
 from langsmith import traceable
-from src.backend.app.models.schemas import ImageSource
-from qdrant_client import QdrantClient
+from langchain_core.runnables import RunnableConfig
+from src.backend.app.models.schemas import RetrievedItem
 from transformers import CLIPModel, CLIPProcessor
+from PIL import Image
 from src.backend.app.config import settings
 from src.backend.app.dependencies import deps
+from src.backend.app.services.embedding import normalize_text
+from src.backend.app.services.vector_store import VectorStore
+from src.backend.app.utils.image_utils import get_image_digest
+
+
+# number of nearest wardrobe items complete_the_look tries as the anchor of an outfit
+OUTFIT_CANDIDATES = 5
+
+
+def run_on_clip_executor(func, *args):
+    """Run CPU-bound CLIP work on the bounded CLIP executor so it never blocks the event loop."""
+    return asyncio.get_running_loop().run_in_executor(deps.clip_executor, partial(func, *args))
+
+
+def encode_texts(model: CLIPModel, processor: CLIPProcessor, texts: list[str]) -> np.ndarray:
+    text_inputs = processor.tokenizer(text=texts, return_tensors="pt", padding=True)
+    input_ids = text_inputs["input_ids"].to(model.device)
+    attention_mask = text_inputs["attention_mask"].to(model.device)
+    with torch.no_grad():
+        text_features = model.get_text_features(input_ids, attention_mask)
+    return text_features.cpu().numpy()
 
 
 @traceable(
@@ -17,67 +43,342 @@ from src.backend.app.dependencies import deps
     },
 )
 def get_text_features(model: CLIPModel, processor: CLIPProcessor, text_query: list[str]):
-    text_inputs = processor.tokenizer(text=text_query, return_tensors="pt", padding=True)
-    input_ids = text_inputs["input_ids"].cuda()
-    attention_mask = text_inputs["attention_mask"].cuda()
+    """Embed text queries, only sending phrases missing from the cache to the model, in one batch.
+
+    Blocks on the forward pass, so it is only meant for startup; requests use
+    ``aget_text_features``.
+    """
+    cache = deps.text_embedding_cache
+    if cache is None:
+        return encode_texts(model, processor, text_query).tolist()
+
+    keys, vectors, misses = lookup_text_features(text_query)
+    if misses:
+        miss_features = encode_texts(model, processor, [text for text, _ in misses])
+        vectors = store_text_features(keys, vectors, misses, miss_features)
+
+    return [vector.tolist() for vector in vectors]
+
+
+@traceable(
+    name="get_text_features",
+    run_type="embedding",
+    metadata={
+        "ls_provider": "huggingface",
+        "ls_model_name": settings.clip_model_name
+    },
+)
+async def aget_text_features(model: CLIPModel, processor: CLIPProcessor, text_query: list[str]):
+    """``get_text_features`` for the event loop.
+
+    Cache lookups and the submission to the micro-batcher happen on the loop,
+    so every waiting session can join the same batch; only the unbatched
+    forward pass is sent to the CLIP executor.
+    """
+    cache = deps.text_embedding_cache
+    if cache is None:
+        return (await run_on_clip_executor(encode_texts, model, processor, text_query)).tolist()
+
+    keys, vectors, misses = lookup_text_features(text_query)
+    if misses:
+        miss_texts = [text for text, _ in misses]
+        if deps.text_embedding_batcher is not None:
+            miss_features = await asyncio.wrap_future(deps.text_embedding_batcher.submit(miss_texts))
+        else:
+            miss_features = await run_on_clip_executor(encode_texts, model, processor, miss_texts)
+        vectors = store_text_features(keys, vectors, misses, miss_features)
+
+    return [vector.tolist() for vector in vectors]
+
+
+def lookup_text_features(text_query: list[str]) -> tuple[list[tuple], list[Optional[np.ndarray]], list[tuple]]:
+    """Return the cache keys, the cached vectors (None on a miss) and the distinct missing keys."""
+    keys = [(normalize_text(text), settings.clip_model_name) for text in text_query]
+    vectors = [deps.text_embedding_cache.get(key) for key in keys]
+    misses = list(dict.fromkeys(key for key, vector in zip(keys, vectors) if vector is None))
+    return keys, vectors, misses
+
+
+def store_text_features(
+    keys: list[tuple],
+    vectors: list[Optional[np.ndarray]],
+    misses: list[tuple],
+    miss_features: np.ndarray,
+) -> list[np.ndarray]:
+    """Cache the freshly encoded misses and fill them into ``vectors``."""
+    computed = dict(zip(misses, miss_features))
+    for key, vector in computed.items():
+        deps.text_embedding_cache.put(key, vector)
+    return [computed[key] if vector is None else vector for key, vector in zip(keys, vectors)]
+
+
+def encode_images(model: CLIPModel, processor: CLIPProcessor, images: list[Image.Image]) -> np.ndarray:
+    pixel_values = processor.image_processor.preprocess(images, return_tensors="pt")["pixel_values"].to(model.device)
     with torch.no_grad():
-        text_features = model.get_text_features(input_ids, attention_mask)
-    return text_features.cpu().numpy().tolist()
+        image_features = model.get_image_features(pixel_values)
+    return image_features.cpu().numpy()
+
+
+@traceable(
+    name="get_image_features",
+    run_type="embedding",
+    metadata={
+        "ls_provider": "huggingface",
+        "ls_model_name": settings.clip_model_name
+    },
+)
+def get_image_features(model: CLIPModel, processor: CLIPProcessor, images: list[Image.Image]):
+    """Embed images with the vision tower, caching vectors by the digest of their pixels."""
+    cache = deps.image_embedding_cache
+    if cache is None:
+        return encode_images(model, processor, images).tolist()
+
+    keys = [(get_image_digest(image), settings.clip_model_name) for image in images]
+    vectors = [cache.get(key) for key in keys]
+
+    misses = {key: image for key, image, vector in zip(keys, images, vectors) if vector is None}
+    if misses:
+        computed = dict(zip(misses, encode_images(model, processor, list(misses.values()))))
+        for key, vector in computed.items():
+            cache.put(key, vector)
+        vectors = [computed[key] if vector is None else vector for key, vector in zip(keys, vectors)]
+
+    return [vector.tolist() for vector in vectors]
+
+
+def warm_text_embedding_cache(
+    model: CLIPModel,
+    processor: CLIPProcessor,
+    vocabulary_path: str,
+    batch_size: int = 64,
+) -> int:
+    """Embed a vocabulary of common phrases (one per line) into the cache ahead of traffic."""
+    with open(vocabulary_path, "r") as file:
+        phrases = list(dict.fromkeys(normalize_text(line) for line in file if line.strip()))
+
+    for batch in batched(phrases, batch_size):
+        features = encode_texts(model, processor, list(batch))
+        for phrase, vector in zip(batch, features):
+            deps.text_embedding_cache.put((phrase, settings.clip_model_name), vector)
+    return len(phrases)
+
+
+async def amap_to_labels(
+    model: CLIPModel,
+    processor: CLIPProcessor,
+    text_features: List[List[float]],
+) -> list[Optional[str]]:
+    """Assign each query the wardrobe category whose name embedding is most similar.
+
+    Label names go through ``aget_text_features`` as well, so after the first call
+    their embeddings come from the text embedding cache.
+    """
+    labels = deps.wardrobe_labels
+    if not labels:
+        return [None] * len(text_features)
+
+    return nearest_labels(labels, await aget_text_features(model, processor, labels), text_features)
+
+
+def nearest_labels(
+    labels: list[str],
+    label_features: List[List[float]],
+    text_features: List[List[float]],
+) -> list[str]:
+    if len(text_features) == 0:
+        return []
+
+    label_features = np.asarray(label_features, dtype=np.float32)
+    label_features /= np.linalg.norm(label_features, axis=1, keepdims=True)
+    queries = np.asarray(text_features, dtype=np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return [labels[i] for i in np.argmax(queries @ label_features.T, axis=1)]
+
+
+def load_images(session_id: str, image_id_list: list[str]) -> list[Image.Image]:
+    """Load the images behind the session's image ids as RGB.
+
+    Blocks on downloads, so async callers run it in a plain thread rather than
+    on the CLIP executor, where a slow URL would hold a slot the model needs.
+    """
+    image_sources = deps.session_manager.get_image_sources(session_id, image_id_list)
+    return [deps.image_fetcher.get_image(source.path, source.bbox).convert("RGB") for source in image_sources]
 
 
 @traceable(
     name="retrieve_item",
     run_type="retriever",
 )
-def retrieve_item(text_features: List[float], q_client: QdrantClient, top_k: int = 1):
-    payloads = []
-    for text_feature in text_features:
-        payloads.append(
-            q_client.query_points(
-                collection_name=settings.collection_name,
-                query=text_feature,
-                with_payload=True,
-                limit=top_k,
-            ).points[0].payload)
+async def retrieve_item(
+    text_features: List[List[float]],
+    vector_store: VectorStore,
+    top_k: int = 1,
+    labels: Optional[List[Optional[str]]] = None,
+) -> list[list[RetrievedItem]]:
+    """Search the wardrobe for every query vector in a single batch.
+
+    With ``labels`` each query only searches items of its category; queries whose
+    category has no hits are searched again without the filter, in one batch.
+    Returns the top-k hits per query, in query order; a query without hits gets an
+    empty list.
+    """
+    results = await vector_store.search_batch(text_features, top_k=top_k, labels=labels)
+    if labels is None:
+        return results
 
-    images = [ImageSource(path=item["image_url"], bbox=item["bbox"]) for item in payloads]
+    retry = [i for i, (retrieved, label) in enumerate(zip(results, labels)) if not retrieved and label is not None]
+    if retry:
+        unfiltered = await vector_store.search_batch([text_features[i] for i in retry], top_k=top_k)
+        for i, retrieved in zip(retry, unfiltered):
+            results[i] = retrieved
+    return results
 
-    return images
+
+async def store_retrieved_items(
+    session_id: str,
+    retrieved_items: list[list[RetrievedItem]],
+) -> list[list[tuple[str, RetrievedItem]]]:
+    """Give every retrieved item an image id in the session, in one session write off the event loop."""
+    items = [item for retrieved in retrieved_items for item in retrieved]
+    image_ids = iter(await asyncio.to_thread(
+        deps.session_manager.store_image_sources,
+        session_id,
+        [item.image_source for item in items],
+    ))
+    return [[(next(image_ids), item) for item in retrieved] for retrieved in retrieved_items]
 
 
-def parse_retrieved_items(image_ids: list[str], item_list: list[str]) -> str:
+def parse_retrieved_items(item_list: list[str], retrieved_image_ids: list[list[tuple[str, RetrievedItem]]]) -> str:
     """Parse the retrieved items from the database.
 
     Args:
-        image_ids: List of image ids.
         item_list: List of item names.
-    
+        retrieved_image_ids: The image ids and items retrieved for each item name.
+
     Returns:
         A string of the retrieved items.
     """
-    return "\n".join([f"{image_id}: {item}" for item, image_id in zip(item_list, image_ids)])
+    output_parts = []
+    for item, retrieved in zip(item_list, retrieved_image_ids):
+        if not retrieved:
+            output_parts.append(f"{item}: no matching item found in the wardrobe")
+            continue
 
+        output = f"{item}:\n"
+        for image_id, retrieved_item in retrieved:
+            output += f"\t{image_id} ({retrieved_item.label}, score: {retrieved_item.score:.3f})\n"
+        output_parts.append(output)
+    return "\n".join(output_parts)
 
-def create_retrieve_item_from_wardrobe(
-    session_id: str,
-    model: CLIPModel,
-    processor: CLIPProcessor,
-    q_client: QdrantClient,
-):
 
-    def retrieve_item_from_wardrobe(item_list: list[str]) -> str:
-        """Retrieve items from the wardrobe.
+async def retrieve_item_from_wardrobe(item_list: list[str], top_k: int = 1, config: RunnableConfig = None) -> str:
+    """Retrieve items from the wardrobe.
+
+    Args:
+        item_list: List of item names.
+        top_k: Number of wardrobe items to return per item name.
+
+    Returns:
+        The image ids, labels and similarity scores of the retrieved items for each item name.
+    """
+    configurable = config["configurable"]
+    session_id = configurable["session_id"]
+    model, processor = configurable["clip_text_model"], configurable["clip_processor"]
+
+    text_features = await aget_text_features(model, processor, item_list)
+    labels = await amap_to_labels(model, processor, text_features) if settings.label_filtering else None
+    retrieved_items = await retrieve_item(text_features, configurable["vector_store"], top_k=top_k, labels=labels)
+    retrieved_image_ids = await store_retrieved_items(session_id, retrieved_items)
+    parsed_retrieved_items = parse_retrieved_items(item_list, retrieved_image_ids)
+    return parsed_retrieved_items
+
+
+async def retrieve_similar_items_from_wardrobe(image_id_list: list[str], top_k: int = 1, config: RunnableConfig = None) -> str:
+    """Retrieve wardrobe items that look like the given images.
+
+    Args:
+        image_id_list: The list of image ids to find similar wardrobe items for.
+        top_k: Number of wardrobe items to return per image.
+
+    Returns:
+        The image ids, labels and similarity scores of the retrieved items for each image id.
+    """
+    configurable = config["configurable"]
+    session_id = configurable["session_id"]
+    processor = configurable["clip_processor"]
+
+    images = await asyncio.to_thread(load_images, session_id, image_id_list)
+    image_features = await run_on_clip_executor(get_image_features, configurable["clip_model"], processor, images)
+    # CLIP image and text embeddings share one space, so label names classify images too
+    labels = await amap_to_labels(configurable["clip_text_model"], processor, image_features) if settings.label_filtering else None
+    retrieved_items = await retrieve_item(image_features, configurable["vector_store"], top_k=top_k, labels=labels)
+    retrieved_image_ids = await store_retrieved_items(session_id, retrieved_items)
+    return parse_retrieved_items(image_id_list, retrieved_image_ids)
+
+
+def parse_outfits(
+    query_list: list[str],
+    outfits: list[Optional[tuple[tuple[str, RetrievedItem], list[tuple[str, RetrievedItem]]]]],
+) -> str:
+    """Format the matched wardrobe item and its outfit-mates for every query."""
+    output_parts = []
+    for query, outfit in zip(query_list, outfits):
+        if outfit is None:
+            output_parts.append(f"{query}: no outfit found in the wardrobe")
+            continue
+
+        (anchor_id, anchor), mates = outfit
+        output = f"{query}:\n\tmatched {anchor_id} ({anchor.label}, score: {anchor.score:.3f})\n\tgoes with:\n"
+        for mate_id, mate in mates:
+            output += f"\t\t{mate_id} ({mate.label})\n"
+        output_parts.append(output)
+    return "\n".join(output_parts)
+
+
+async def complete_the_look(item_list: list[str] = None, image_id_list: list[str] = None, config: RunnableConfig = None) -> str:
+    """Find wardrobe items that were worn together with the given items, without asking a stylist.
+
+    Args:
+        item_list: Descriptions of the items to complete the look for.
+        image_id_list: Image ids of the items to complete the look for.
+
+    Returns:
+        For each item, the closest wardrobe item and the image ids and labels of the items worn with it.
+    """
+    if deps.outfit_index is None:
+        return "[ERROR] No outfit index is loaded."
+
+    configurable = config["configurable"]
+    session_id = configurable["session_id"]
+    model, processor = configurable["clip_text_model"], configurable["clip_processor"]
+    item_list = item_list or []
+    image_id_list = image_id_list or []
+
+    features = await aget_text_features(model, processor, item_list) if item_list else []
+    if image_id_list:
+        images = await asyncio.to_thread(load_images, session_id, image_id_list)
+        features += await run_on_clip_executor(get_image_features, configurable["clip_model"], processor, images)
+    labels = await amap_to_labels(model, processor, features) if settings.label_filtering else None
+    candidates = await retrieve_item(features, configurable["vector_store"], top_k=OUTFIT_CANDIDATES, labels=labels)
 
-        Args:
-            item_list: List of item names.
+    # anchor each query on its closest wardrobe item that belongs to an outfit
+    matches = []
+    for retrieved in candidates:
+        match = None
+        for anchor in retrieved:
+            mates = deps.outfit_index.get_outfit_mates(anchor.point_id)
+            if mates:
+                match = [anchor, *mates]
+                break
+        matches.append(match)
 
-        Returns:
-            A dictionary with item name as the key and image id as the value.
-        """
-        text_features = get_text_features(model, processor, item_list)
-        images = retrieve_item(text_features, q_client, top_k=1)
-        image_ids = [deps.session_manager.store_image_source(session_id, image) for image in images]
-        parsed_retrieved_items = parse_retrieved_items(image_ids, item_list)
-        return parsed_retrieved_items
+    stored = iter(await store_retrieved_items(session_id, [match for match in matches if match is not None]))
+    outfits = []
+    for match in matches:
+        if match is None:
+            outfits.append(None)
+            continue
+        anchor, *mates = next(stored)
+        outfits.append((anchor, mates))
 
-    return retrieve_item_from_wardrobe
+    return parse_outfits(item_list + image_id_list, outfits)
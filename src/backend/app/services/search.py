@@ -1,3 +1,4 @@
+import asyncio
 from ddgs import DDGS
 
 
@@ -30,7 +31,7 @@ def parse_search_results(search_results: dict[str, list[dict[str, str]]],) -> st
     return "\n".join(output_parts)
 
 
-def search_item(items: list[str], max_results: int = 5) -> str:
+async def search_item(items: list[str], max_results: int = 5) -> str:
     """ Search for items on internet
 
     Args:
@@ -41,7 +42,10 @@ def search_item(items: list[str], max_results: int = 5) -> str:
         A string of the title, link, and body of each search result for each item.
     """
 
-    search_results = {}
-    for item in items:
-        search_results[item] = DDGS().text(item, max_results=max_results, timelimit="m", backend="google")
+    # DDGS is synchronous, so each search runs in a thread and the items are searched concurrently
+    results = await asyncio.gather(*[
+        asyncio.to_thread(DDGS().text, item, max_results=max_results, timelimit="m", backend="google")
+        for item in items
+    ])
+    search_results = dict(zip(items, results))
     return parse_search_results(search_results)
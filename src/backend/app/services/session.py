@@ -1,43 +1,141 @@
 from src.backend.app.models.schemas import ImageSource
+import asyncio
 import hashlib
+import threading
 import uuid
+from contextlib import asynccontextmanager
 from typing import Optional, Any, List
 from src.backend.app.models.schemas import Session, ImageResult, MessageHistory, SessionDataResponse
+from src.backend.app.services.session_store import SessionStore, InMemorySessionStore
 
 
-class SessionManager:
+class _LockShard:
+    """Per-session turn locks for the sessions hashed to one shard, created on demand.
+
+    A lock is dropped again once nobody holds or waits for it, so the shard only
+    ever holds locks of sessions that are in use.
+    """
 
     def __init__(self):
-        self._sessions: dict[str, Session] = {}
+        self.lock = threading.Lock()
+        self.turn_locks: dict[str, list] = {}
+
+    def acquire(self, locks: dict[str, list], session_id: str, factory) -> Any:
+        with self.lock:
+            entry = locks.setdefault(session_id, [factory(), 0])
+            entry[1] += 1
+            return entry[0]
+
+    def release(self, locks: dict[str, list], session_id: str) -> None:
+        with self.lock:
+            entry = locks[session_id]
+            entry[1] -= 1
+            if entry[1] == 0:
+                del locks[session_id]
+
+
+class SessionManager:
+    """Session state on top of a SessionStore, safe to use from many threads and tasks.
+
+    Every read-modify-write of a session goes through ``SessionStore.update``,
+    which is atomic in the store, so concurrent updates are not lost even when
+    several workers share a SQLite or Redis store. ``turn`` serializes whole
+    chat turns of a session, but only within this process: two turns of one
+    session on different workers still interleave, so route a session to a
+    single worker if its turns must not overlap. Turn locks live in shards
+    picked by the session id, so different sessions never wait on each other.
+
+    Stores may hit disk or the network, so async callers run every method
+    except ``turn`` in a thread.
+    """
+
+    def __init__(self, store: Optional[SessionStore] = None, num_shards: int = 64):
+        self.store = store or InMemorySessionStore()
+        self._shards = [_LockShard() for _ in range(num_shards)]
+
+    def _get_shard(self, session_id: str) -> _LockShard:
+        return self._shards[hash(session_id) % len(self._shards)]
+
+    @asynccontextmanager
+    async def turn(self, session_id: str):
+        """Run one chat turn of the session, waiting for any turn already in progress."""
+        shard = self._get_shard(session_id)
+        turn_lock = shard.acquire(shard.turn_locks, session_id, asyncio.Lock)
+        try:
+            async with turn_lock:
+                yield
+        finally:
+            shard.release(shard.turn_locks, session_id)
+
+    def _load(self, session_id: str) -> Session:
+        session = self.store.get(session_id)
+        if session is None:
+            raise KeyError(f"Session {session_id} not found or expired")
+        return session
+
+    def _update(self, session_id: str, mutate) -> None:
+        if self.store.update(session_id, mutate) is None:
+            raise KeyError(f"Session {session_id} not found or expired")
 
     def get_or_create_session(self, session_id: Optional[str] = None) -> str:
-        if session_id and session_id in self._sessions:
-            return session_id
-        elif session_id:
-            self._sessions[session_id] = Session(image_source_store={}, message_history=[])
+        if session_id:
+            if self.store.get(session_id) is None:
+                self.store.add(session_id, Session(image_source_store={}, message_history=[]))
             return session_id
         else:
             session_id = str(uuid.uuid4())
-            self._sessions[session_id] = Session(image_source_store={}, message_history=[])
+            self.store.put(session_id, Session(image_source_store={}, message_history=[]))
             return session_id
 
     def get_model_source(self, session_id) -> ImageSource:
-        model_image_id = self._sessions[session_id].model_image_id
-        return self._sessions[session_id].image_source_store.get(model_image_id)
+        session = self._load(session_id)
+        return session.image_source_store.get(session.model_image_id)
 
-    def store_image_source(self, session_id: str, image_data: ImageSource, is_model: bool = False) -> str:
+    @staticmethod
+    def get_image_id(image_data: ImageSource) -> str:
         key_string = f"{image_data.path}:{image_data.bbox}"
-        unique_id = hashlib.md5(key_string.encode()).hexdigest()[:7]
-        self._sessions[session_id].image_source_store[unique_id] = image_data
-        if is_model:
-            self._sessions[session_id].model_image_id = unique_id
+        return hashlib.md5(key_string.encode()).hexdigest()[:7]
+
+    def store_image_source(self, session_id: str, image_data: ImageSource, is_model: bool = False) -> str:
+        unique_id = self.get_image_id(image_data)
+
+        def mutate(session: Session) -> bool:
+            if unique_id in session.image_source_store and (not is_model or session.model_image_id == unique_id):
+                # already stored, no need to write the session back
+                return False
+            session.image_source_store[unique_id] = image_data
+            if is_model:
+                session.model_image_id = unique_id
+            return True
+
+        self._update(session_id, mutate)
         return unique_id
 
+    def store_image_sources(self, session_id: str, image_sources: list[ImageSource]) -> list[str]:
+        """Store many image sources with one read and at most one write of the session."""
+        image_ids = [self.get_image_id(image_data) for image_data in image_sources]
+
+        def mutate(session: Session) -> bool:
+            new_sources = {
+                image_id: image_data
+                for image_id, image_data in zip(image_ids, image_sources)
+                if image_id not in session.image_source_store
+            }
+            session.image_source_store.update(new_sources)
+            return bool(new_sources)
+
+        self._update(session_id, mutate)
+        return image_ids
+
     def get_image_source(self, session_id: str, image_id: str) -> ImageSource:
-        return self._sessions[session_id].image_source_store[image_id]
+        return self._load(session_id).image_source_store[image_id]
+
+    def get_image_sources(self, session_id: str, image_ids: list[str]) -> list[ImageSource]:
+        image_source_store = self._load(session_id).image_source_store
+        return [image_source_store[image_id] for image_id in image_ids]
 
     def load_message_history(self, session_id: str) -> list[MessageHistory]:
-        return self._sessions[session_id].message_history
+        return list(self._load(session_id).message_history)
 
     def store_message(
         self,
@@ -49,20 +147,29 @@ class SessionManager:
     ) -> None:
         user_message = MessageHistory(role="user", content=user_query, images=user_images)
         ai_message = MessageHistory(role="assistant", content=ai_response, images=ai_images)
-        self._sessions[session_id].message_history.append(user_message)
-        self._sessions[session_id].message_history.append(ai_message)
+
+        def mutate(session: Session) -> bool:
+            session.message_history.extend([user_message, ai_message])
+            return True
+
+        self._update(session_id, mutate)
 
     def cleanup_session(self, session_id: str):
-        del self._sessions[session_id]
+        self.store.delete(session_id)
 
     def get_session_data(self, session_id: str) -> Optional[SessionDataResponse]:
-        if session_id not in self._sessions:
+        session = self.store.get(session_id)
+        if session is None:
             return None
 
-        session = self._sessions[session_id]
-
         return SessionDataResponse(
             session_id=session_id,
             messages=session.message_history,
             has_model_image=session.model_image_id is not None,
         )
+
+    def stats(self) -> dict:
+        return self.store.stats()
+
+    def close(self) -> None:
+        self.store.close()
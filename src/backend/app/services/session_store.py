@@ -0,0 +1,344 @@
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Callable, Optional
+from src.backend.app.config import settings
+from src.backend.app.models.schemas import Session
+
+
+class SessionStore(ABC):
+    """Where SessionManager keeps sessions; expired sessions read as missing."""
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[Session]:
+        """Return the session and refresh its TTL, or None if it is unknown or expired."""
+
+    @abstractmethod
+    def put(self, session_id: str, session: Session) -> None:
+        pass
+
+    @abstractmethod
+    def add(self, session_id: str, session: Session) -> None:
+        """Store the session unless a live session with this id exists already."""
+
+    @abstractmethod
+    def update(self, session_id: str, mutate: Callable[[Session], bool]) -> Optional[Session]:
+        """Atomically read the session, apply ``mutate`` and write it back, refreshing its TTL.
+
+        ``mutate`` changes the session in place and returns whether it changed
+        anything; it may run more than once if another writer gets in between.
+        Returns the updated session, or None if it is unknown or expired.
+        """
+
+    @abstractmethod
+    def delete(self, session_id: str) -> None:
+        pass
+
+    @abstractmethod
+    def stats(self) -> dict:
+        """Backend name, session count, memory usage and eviction counters."""
+
+    def close(self) -> None:
+        pass
+
+
+class InMemorySessionStore(SessionStore):
+    """Process-local store with a sliding TTL and an LRU cap on the number of sessions.
+
+    Memory usage is tracked as the serialized size of each session at its last write.
+    """
+
+    def __init__(self, ttl_seconds: float = 86400, max_sessions: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        # session id -> (session, last access time, serialized size)
+        self._sessions: OrderedDict[str, tuple[Session, float, int]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.size_bytes = 0
+        self.ttl_evictions = 0
+        self.lru_evictions = 0
+
+    def _remove(self, session_id: str) -> None:
+        _, _, size = self._sessions.pop(session_id)
+        self.size_bytes -= size
+
+    def _evict_expired(self, now: float) -> None:
+        # the dict is ordered by last access, so expired sessions sit at the front
+        while self._sessions:
+            session_id, (_, accessed_at, _) = next(iter(self._sessions.items()))
+            if now - accessed_at < self.ttl_seconds:
+                break
+            self._remove(session_id)
+            self.ttl_evictions += 1
+
+    def _get(self, session_id: str, now: float) -> Optional[Session]:
+        self._evict_expired(now)
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return None
+        session, _, size = entry
+        self._sessions[session_id] = (session, now, size)
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def _put(self, session_id: str, session: Session, size: int, now: float) -> None:
+        if session_id in self._sessions:
+            self._remove(session_id)
+        self._sessions[session_id] = (session, now, size)
+        self.size_bytes += size
+        self._evict_expired(now)
+        while len(self._sessions) > self.max_sessions:
+            self._remove(next(iter(self._sessions)))
+            self.lru_evictions += 1
+
+    def get(self, session_id: str) -> Optional[Session]:
+        now = time.monotonic()
+        with self._lock:
+            return self._get(session_id, now)
+
+    def put(self, session_id: str, session: Session) -> None:
+        size = len(session.model_dump_json())
+        now = time.monotonic()
+        with self._lock:
+            self._put(session_id, session, size, now)
+
+    def add(self, session_id: str, session: Session) -> None:
+        size = len(session.model_dump_json())
+        now = time.monotonic()
+        with self._lock:
+            if self._get(session_id, now) is None:
+                self._put(session_id, session, size, now)
+
+    def update(self, session_id: str, mutate: Callable[[Session], bool]) -> Optional[Session]:
+        now = time.monotonic()
+        with self._lock:
+            session = self._get(session_id, now)
+            if session is not None and mutate(session):
+                self._put(session_id, session, len(session.model_dump_json()), now)
+            return session
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            if session_id in self._sessions:
+                self._remove(session_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "sessions": len(self._sessions),
+                "size_bytes": self.size_bytes,
+                "ttl_evictions": self.ttl_evictions,
+                "lru_evictions": self.lru_evictions,
+            }
+
+
+class SQLiteSessionStore(SessionStore):
+    """Sessions as JSON rows in a SQLite database in WAL mode, shareable between workers.
+
+    Expired rows are deleted at most every ``cleanup_interval`` seconds, on write.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float = 86400, cleanup_interval: float = 60):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.cleanup_interval = cleanup_interval
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, data TEXT NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS sessions_accessed_at ON sessions (accessed_at)")
+        self._lock = threading.Lock()
+        self._last_cleanup = 0.0
+        self.ttl_evictions = 0
+
+    def _evict_expired(self, now: float) -> None:
+        if now - self._last_cleanup < self.cleanup_interval:
+            return
+        cursor = self._connection.execute("DELETE FROM sessions WHERE accessed_at < ?", (now - self.ttl_seconds,))
+        self.ttl_evictions += cursor.rowcount
+        self._last_cleanup = now
+
+    def get(self, session_id: str) -> Optional[Session]:
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT data FROM sessions WHERE id = ? AND accessed_at >= ?",
+                (session_id, now - self.ttl_seconds),
+            ).fetchone()
+            if row is None:
+                return None
+            self._connection.execute("UPDATE sessions SET accessed_at = ? WHERE id = ?", (now, session_id))
+        return Session.model_validate_json(row[0])
+
+    def put(self, session_id: str, session: Session) -> None:
+        data = session.model_dump_json()
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT INTO sessions (id, data, accessed_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET data = excluded.data, accessed_at = excluded.accessed_at",
+                (session_id, data, now),
+            )
+            self._evict_expired(now)
+
+    def add(self, session_id: str, session: Session) -> None:
+        data = session.model_dump_json()
+        now = time.time()
+        with self._lock:
+            # an expired row with the same id is replaced, a live one is kept
+            self._connection.execute(
+                "INSERT INTO sessions (id, data, accessed_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET data = excluded.data, accessed_at = excluded.accessed_at "
+                "WHERE sessions.accessed_at < ?",
+                (session_id, data, now, now - self.ttl_seconds),
+            )
+            self._evict_expired(now)
+
+    def update(self, session_id: str, mutate: Callable[[Session], bool]) -> Optional[Session]:
+        now = time.time()
+        with self._lock:
+            # BEGIN IMMEDIATE takes the write lock up front, so other workers wait
+            # instead of overwriting the session between the read and the write
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._connection.execute(
+                    "SELECT data FROM sessions WHERE id = ? AND accessed_at >= ?",
+                    (session_id, now - self.ttl_seconds),
+                ).fetchone()
+                session = None
+                if row is not None:
+                    session = Session.model_validate_json(row[0])
+                    if mutate(session):
+                        self._connection.execute(
+                            "UPDATE sessions SET data = ?, accessed_at = ? WHERE id = ?",
+                            (session.model_dump_json(), now, session_id),
+                        )
+                    else:
+                        self._connection.execute("UPDATE sessions SET accessed_at = ? WHERE id = ?", (now, session_id))
+                self._connection.execute("COMMIT")
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+        return session
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def stats(self) -> dict:
+        with self._lock:
+            sessions, data_bytes = self._connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM sessions"
+            ).fetchone()
+            page_count = self._connection.execute("PRAGMA page_count").fetchone()[0]
+            page_size = self._connection.execute("PRAGMA page_size").fetchone()[0]
+            return {
+                "backend": "sqlite",
+                "sessions": sessions,
+                "size_bytes": data_bytes,
+                "file_bytes": page_count * page_size,
+                "ttl_evictions": self.ttl_evictions,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+class RedisSessionStore(SessionStore):
+    """Sessions as JSON strings in Redis (or any server speaking its protocol) with a sliding TTL.
+
+    Expiry and memory-pressure evictions are done by the server and read back
+    from ``INFO``. ``client`` replaces the connection made from ``url``, e.g.
+    with an in-process ``fakeredis`` server.
+    """
+
+    def __init__(self, url: str, ttl_seconds: float = 86400, key_prefix: str = "session:", client=None):
+        if client is None:
+            # only needed for this backend, so it is not a hard dependency
+            try:
+                import redis
+            except ImportError as error:
+                raise ImportError("SESSION_BACKEND=redis requires the redis extra (uv sync --extra redis)") from error
+            client = redis.Redis.from_url(url)
+
+        self.client = client
+        self.ttl_seconds = int(ttl_seconds)
+        self.key_prefix = key_prefix
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.key_prefix}{session_id}"
+
+    def get(self, session_id: str) -> Optional[Session]:
+        data = self.client.getex(self._key(session_id), ex=self.ttl_seconds)
+        if data is None:
+            return None
+        return Session.model_validate_json(data)
+
+    def put(self, session_id: str, session: Session) -> None:
+        self.client.set(self._key(session_id), session.model_dump_json(), ex=self.ttl_seconds)
+
+    def add(self, session_id: str, session: Session) -> None:
+        self.client.set(self._key(session_id), session.model_dump_json(), ex=self.ttl_seconds, nx=True)
+
+    def update(self, session_id: str, mutate: Callable[[Session], bool]) -> Optional[Session]:
+        key = self._key(session_id)
+
+        def apply(pipe) -> Optional[Session]:
+            # the key is WATCHed, so EXEC fails and this is retried if another
+            # worker writes the session before the transaction commits
+            data = pipe.get(key)
+            if data is None:
+                return None
+            session = Session.model_validate_json(data)
+            changed = mutate(session)
+            pipe.multi()
+            if changed:
+                pipe.set(key, session.model_dump_json(), ex=self.ttl_seconds)
+            else:
+                pipe.expire(key, self.ttl_seconds)
+            return session
+
+        return self.client.transaction(apply, key, value_from_callable=True)
+
+    def delete(self, session_id: str) -> None:
+        self.client.delete(self._key(session_id))
+
+    def _info(self, section: str) -> dict:
+        try:
+            return self.client.info(section)
+        except Exception:
+            # stand-ins such as fakeredis do not implement INFO
+            return {}
+
+    def stats(self) -> dict:
+        memory = self._info("memory")
+        counters = self._info("stats")
+        return {
+            "backend": "redis",
+            "sessions": self.client.dbsize(),
+            "size_bytes": memory.get("used_memory"),
+            "ttl_evictions": counters.get("expired_keys"),
+            "lru_evictions": counters.get("evicted_keys"),
+        }
+
+    def close(self) -> None:
+        self.client.close()
+
+
+def create_session_store() -> SessionStore:
+    if settings.session_backend == "sqlite":
+        return SQLiteSessionStore(settings.session_sqlite_path, ttl_seconds=settings.session_ttl_seconds)
+    if settings.session_backend == "redis":
+        return RedisSessionStore(settings.session_redis_url, ttl_seconds=settings.session_ttl_seconds)
+    return InMemorySessionStore(ttl_seconds=settings.session_ttl_seconds, max_sessions=settings.session_max_sessions)
@@ -0,0 +1,238 @@
+import asyncio
+import json
+import os
+from abc import ABC, abstractmethod
+from typing import Optional, Sequence
+import numpy as np
+from qdrant_client import AsyncQdrantClient, models
+from src.backend.app.config import settings
+from src.backend.app.models.schemas import ImageSource, RetrievedItem
+
+
+class VectorStore(ABC):
+    """Nearest-neighbour search over the wardrobe.
+
+    Every method is a coroutine so lookups never block the event loop that
+    serves ``/chat``.
+    """
+
+    @abstractmethod
+    async def search_batch(
+        self,
+        vectors: Sequence[Sequence[float]],
+        top_k: int = 1,
+        labels: Optional[Sequence[Optional[str]]] = None,
+    ) -> list[list[RetrievedItem]]:
+        """Return the top-k items for every query vector, in query order.
+
+        ``labels`` optionally restricts each query to items of one category; a
+        query without hits gets an empty list.
+        """
+
+    @abstractmethod
+    async def get_labels(self) -> list[str]:
+        """Return the distinct item categories stored in the wardrobe."""
+
+    async def close(self) -> None:
+        pass
+
+
+def payload_to_retrieved_item(payload: dict, score: float, point_id: Optional[str] = None) -> RetrievedItem:
+    return RetrievedItem(
+        image_source=ImageSource(path=payload["image_url"], bbox=payload["bbox"]),
+        score=score,
+        label=payload.get("label"),
+        point_id=point_id,
+    )
+
+
+def get_search_params() -> models.SearchParams:
+    """Search-time HNSW and quantization settings matching how the collection was built."""
+    return models.SearchParams(
+        hnsw_ef=settings.qdrant_hnsw_ef,
+        quantization=models.QuantizationSearchParams(
+            rescore=settings.qdrant_quantization_rescore,
+            oversampling=settings.qdrant_quantization_oversampling,
+        ),
+    )
+
+
+def get_label_filter(label: Optional[str]) -> Optional[models.Filter]:
+    if label is None:
+        return None
+    return models.Filter(must=[models.FieldCondition(key="label", match=models.MatchValue(value=label))])
+
+
+class QdrantVectorStore(VectorStore):
+    """Searches a Qdrant collection, sending every query of a batch in one request."""
+
+    def __init__(
+        self,
+        client: AsyncQdrantClient,
+        collection_name: str,
+        search_params: Optional[models.SearchParams] = None,
+    ):
+        self.client = client
+        self.collection_name = collection_name
+        self.search_params = search_params
+
+    async def search_batch(
+        self,
+        vectors: Sequence[Sequence[float]],
+        top_k: int = 1,
+        labels: Optional[Sequence[Optional[str]]] = None,
+    ) -> list[list[RetrievedItem]]:
+        labels = labels or [None] * len(vectors)
+        responses = await self.client.query_batch_points(
+            collection_name=self.collection_name,
+            requests=[
+                models.QueryRequest(
+                    query=list(vector),
+                    filter=get_label_filter(label),
+                    params=self.search_params,
+                    with_payload=True,
+                    limit=top_k,
+                )
+                for vector, label in zip(vectors, labels)
+            ],
+        )
+
+        return [
+            [payload_to_retrieved_item(point.payload, point.score, str(point.id)) for point in response.points]
+            for response in responses
+        ]
+
+    async def get_labels(self, limit: int = 1000) -> list[str]:
+        # facets are served from the keyword payload index on "label"
+        response = await self.client.facet(collection_name=self.collection_name, key="label", limit=limit)
+        return sorted(str(hit.value) for hit in response.hits)
+
+    async def close(self) -> None:
+        await self.client.close()
+
+
+class LocalVectorStore(VectorStore):
+    """In-process cosine search over an ingestion embedding cache directory.
+
+    The float16 matrix written by ``utils/create_collection_ctl.py
+    --embedding_cache_dir`` is memory-mapped as is; scores are computed with
+    one matrix multiply per block of rows and top-k is taken with
+    ``argpartition``, so small wardrobes are searched without a network hop.
+    The search runs in a worker thread; numpy releases the GIL for the matmul.
+
+    The cache holds every dataset embedded with the model, so with
+    ``collection_name`` only the rows listed for that collection at ingestion
+    are served; those rows are copied out of the memory map.
+    """
+
+    def __init__(self, path: str, collection_name: Optional[str] = None, block_size: int = 65536):
+        with open(os.path.join(path, "meta.json"), "r") as file:
+            self.dim = json.load(file)["dim"]
+
+        with open(os.path.join(path, "payloads.jsonl"), "r") as file:
+            payloads = [json.loads(line) for line in file]
+
+        if payloads:
+            vectors = np.memmap(
+                os.path.join(path, "embeddings.f16"),
+                dtype=np.float16,
+                mode="r",
+                shape=(len(payloads), self.dim),
+            )
+        else:
+            # an empty file cannot be memory-mapped
+            vectors = np.empty((0, self.dim), dtype=np.float16)
+
+        if collection_name is not None:
+            ids_path = os.path.join(path, "collections", f"{collection_name}.ids")
+            if not os.path.exists(ids_path):
+                raise FileNotFoundError(
+                    f"No id list for collection {collection_name} in {path}; "
+                    "build the collection with --embedding_cache_dir to write one"
+                )
+            with open(ids_path, "r") as file:
+                point_ids = {line.strip() for line in file if line.strip()}
+            rows = [row for row, payload in enumerate(payloads) if payload["id"] in point_ids]
+            payloads = [payloads[row] for row in rows]
+            vectors = vectors[rows] if rows else np.empty((0, self.dim), dtype=np.float16)
+
+        self.payloads = payloads
+        self.vectors = vectors
+        self.block_size = block_size
+        self.labels = np.array([payload.get("label") for payload in self.payloads], dtype=object)
+        self._inverse_norms = np.empty(len(self.payloads), dtype=np.float32)
+        for start in range(0, len(self.payloads), block_size):
+            block = self.vectors[start:start + block_size].astype(np.float32)
+            self._inverse_norms[start:start + block_size] = 1 / np.maximum(np.linalg.norm(block, axis=1), 1e-12)
+
+    def __len__(self) -> int:
+        return len(self.payloads)
+
+    async def get_labels(self) -> list[str]:
+        return sorted({label for label in self.labels if label is not None})
+
+    def _scores(self, queries: np.ndarray) -> np.ndarray:
+        scores = np.empty((len(queries), len(self)), dtype=np.float32)
+        for start in range(0, len(self), self.block_size):
+            block = self.vectors[start:start + self.block_size].astype(np.float32)
+            scores[:, start:start + len(block)] = queries @ block.T
+        return scores * self._inverse_norms
+
+    async def search_batch(
+        self,
+        vectors: Sequence[Sequence[float]],
+        top_k: int = 1,
+        labels: Optional[Sequence[Optional[str]]] = None,
+    ) -> list[list[RetrievedItem]]:
+        return await asyncio.to_thread(self._search_batch, vectors, top_k, labels)
+
+    def _search_batch(
+        self,
+        vectors: Sequence[Sequence[float]],
+        top_k: int,
+        labels: Optional[Sequence[Optional[str]]],
+    ) -> list[list[RetrievedItem]]:
+        queries = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        scores = self._scores(queries)
+
+        results = []
+        for query_scores, label in zip(scores, labels or [None] * len(queries)):
+            candidates = np.arange(len(self)) if label is None else np.flatnonzero(self.labels == label)
+            k = min(top_k, len(candidates))
+            if k == 0:
+                results.append([])
+                continue
+
+            candidate_scores = query_scores[candidates]
+            top = np.argpartition(-candidate_scores, k - 1)[:k]
+            top = top[np.argsort(-candidate_scores[top])]
+            results.append([
+                payload_to_retrieved_item(
+                    self.payloads[candidates[i]],
+                    float(candidate_scores[i]),
+                    self.payloads[candidates[i]].get("id"),
+                )
+                for i in top
+            ])
+        return results
+
+
+def create_vector_store() -> VectorStore:
+    if settings.retrieval_backend == "local":
+        if settings.local_index_path is None:
+            raise ValueError("local_index_path must be set to use the local retrieval backend")
+        return LocalVectorStore(settings.local_index_path, collection_name=settings.collection_name)
+
+    client = AsyncQdrantClient(
+        url=settings.qdrant_url,
+        grpc_port=settings.qdrant_grpc_port,
+        prefer_grpc=settings.qdrant_prefer_grpc,
+        timeout=settings.qdrant_timeout,
+        pool_size=settings.qdrant_pool_size,
+    )
+    return QdrantVectorStore(
+        client,
+        settings.collection_name,
+        search_params=get_search_params(),
+    )
@@ -1,11 +1,20 @@
+import asyncio
+from functools import cache
 from langsmith import traceable, get_current_run_tree
-from PIL import Image
 from jinja2 import Template
+from langchain_core.runnables import RunnableConfig
 from google import genai
+from google.genai import types
 from src.backend.app.config import settings
 from src.backend.app.dependencies import deps
-from src.backend.app.models.schemas import ImageSource
-from src.backend.app.utils.image_utils import bytes_to_base64_data_url, get_image_from_source
+from src.backend.app.models.schemas import ImageSource, PreparedImage
+from src.backend.app.utils.image_utils import get_payload_report
+
+
+@cache
+def get_genai_client() -> genai.Client:
+    """One client per process, so its connection pool is reused across requests."""
+    return genai.Client()
 
 
 @traceable(
@@ -16,7 +25,7 @@ from src.backend.app.utils.image_utils import bytes_to_base64_data_url, get_imag
         "ls_model_name": settings.vton_model,
     },
 )
-def virtual_try_on_agent(model_image: Image.Image, item_images: list[Image.Image]) -> tuple[bytes, str]:
+async def virtual_try_on_agent(model_image: PreparedImage, item_images: list[PreparedImage]) -> tuple[bytes, str]:
 
     prompt_template = deps.prompt_manager.get_prompt("vton")
 
@@ -24,10 +33,12 @@ def virtual_try_on_agent(model_image: Image.Image, item_images: list[Image.Image
 
     prompt = template.render()
 
-    g_client = genai.Client()
-    response = g_client.models.generate_content(
+    response = await get_genai_client().aio.models.generate_content(
         model=settings.vton_model,
-        contents=[model_image, *item_images, prompt],
+        contents=[
+            *[types.Part.from_bytes(data=image.data, mime_type=image.mime_type) for image in [model_image, *item_images]],
+            prompt,
+        ],
     )
 
     current_run = get_current_run_tree()
@@ -38,6 +49,7 @@ def virtual_try_on_agent(model_image: Image.Image, item_images: list[Image.Image
             "output_tokens": response.usage_metadata.candidates_token_count,
             "total_tokens": response.usage_metadata.total_token_count
         }
+        current_run.metadata["image_payload"] = get_payload_report([model_image, *item_images])
 
     image_parts = response.parts[0].as_image()
     image_bytes, mime_type = image_parts.image_bytes, image_parts.mime_type
@@ -45,34 +57,34 @@ def virtual_try_on_agent(model_image: Image.Image, item_images: list[Image.Image
     return image_bytes, mime_type
 
 
-def create_virtual_try_on_image(session_id: str):
-
-    def get_virtual_try_on_image(item_image_ids: list[str]) -> str:
-        """Get a virtual try-on image of a model wearing a new outfit.
+async def get_virtual_try_on_image(item_image_ids: list[str], config: RunnableConfig = None) -> str:
+    """Get a virtual try-on image of a model wearing a new outfit.
 
-        Args:
-            item_image_ids: The image ids of the item images.
+    Args:
+        item_image_ids: The image ids of the item images.
 
-        Returns:
-            An image id of the virtual try-on image.
-        """
+    Returns:
+        An image id of the virtual try-on image.
+    """
 
-        model_image_source = deps.session_manager.get_model_source(session_id)
-        if model_image_source is None:
-            return "[ERROR] User has not uploaded his / her photo yet."
+    session_id = config["configurable"]["session_id"]
+    model_image_source = await asyncio.to_thread(deps.session_manager.get_model_source, session_id)
+    if model_image_source is None:
+        return "[ERROR] User has not uploaded his / her photo yet."
 
-        item_image_sources = [deps.session_manager.get_image_source(session_id, item_image_id) for item_image_id in item_image_ids]
+    item_image_sources = await asyncio.to_thread(deps.session_manager.get_image_sources, session_id, item_image_ids)
 
-        model_image = get_image_from_source(model_image_source.path, model_image_source.bbox)
-        item_images = [get_image_from_source(item_image_source.path, item_image_source.bbox) for item_image_source in item_image_sources]
+    model_image, *item_images = await asyncio.gather(*[
+        asyncio.to_thread(deps.image_preparer.prepare, image_source.path, image_source.bbox)
+        for image_source in [model_image_source, *item_image_sources]
+    ])
 
-        image_bytes, mime_type = virtual_try_on_agent(model_image, item_images)
-        virtual_try_on_image = bytes_to_base64_data_url(image_bytes, mime_type)
-        virtual_try_on_image_id = deps.session_manager.store_image_source(
-            session_id,
-            ImageSource(path=virtual_try_on_image, bbox=None),
-        )
-
-        return virtual_try_on_image_id
+    image_bytes, mime_type = await virtual_try_on_agent(model_image, item_images)
+    virtual_try_on_image = await asyncio.to_thread(deps.blob_store.put, image_bytes, mime_type)
+    virtual_try_on_image_id = await asyncio.to_thread(
+        deps.session_manager.store_image_source,
+        session_id,
+        ImageSource(path=virtual_try_on_image, bbox=None),
+    )
 
-    return get_virtual_try_on_image
+    return virtual_try_on_image_id
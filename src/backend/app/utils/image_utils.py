@@ -1,20 +1,249 @@
 from urllib.parse import urlparse
-from typing import Optional, Tuple
+from typing import Callable, Literal, Optional, Tuple
 import os
 import base64
+import hashlib
+import threading
 from PIL import Image
 from io import BytesIO
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from src.backend.app.models.schemas import PreparedImage
+from src.backend.app.services.blob_store import BlobStore, is_blob_ref
+from src.backend.app.utils.lru import LRUCache
 
 
-def get_image_from_source(path: str, bbox: Optional[Tuple[float, float, float, float]] = None) -> Image.Image:
+def get_image_nbytes(image: Image.Image) -> int:
+    return image.width * image.height * len(image.getbands())
+
+
+def create_http_session(pool_size: int = 16, max_retries: int = 2) -> requests.Session:
+    """Create a keep-alive HTTP session with retries on transient errors."""
+    retry = Retry(
+        total=max_retries,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET",),
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class ImageFetcher:
+    """Shared image loading layer with pooled connections and three cache tiers.
+
+    Raw bytes of remote images are kept in a memory LRU with a byte budget and,
+    optionally, on disk under ``sha256(url)``; decoded and cropped images are kept
+    in a second LRU keyed by ``(path, bbox)``, so repeated tool calls on the same
+    wardrobe items skip the download and the decode.
+    """
+
+    def __init__(
+        self,
+        timeout: float = 10.0,
+        pool_size: int = 16,
+        max_retries: int = 2,
+        memory_cache_bytes: int = 256 * 1024 * 1024,
+        decoded_cache_bytes: int = 128 * 1024 * 1024,
+        disk_cache_dir: Optional[str] = None,
+        blob_store: Optional[BlobStore] = None,
+    ):
+        self.timeout = timeout
+        self.blob_store = blob_store
+        self.session = create_http_session(pool_size=pool_size, max_retries=max_retries)
+        self.memory_cache = LRUCache(memory_cache_bytes)
+        self.decoded_cache = LRUCache(decoded_cache_bytes, sizeof=get_image_nbytes)
+        self.disk_cache_dir = disk_cache_dir
+        if disk_cache_dir is not None:
+            os.makedirs(disk_cache_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self.disk_hits = 0
+        self.downloads = 0
+        self.bytes_downloaded = 0
+        self.bytes_saved = 0
+
+    def _get_disk_path(self, url: str) -> str:
+        digest = hashlib.sha256(url.encode()).hexdigest()
+        return os.path.join(self.disk_cache_dir, digest[:2], digest)
+
+    def _read_disk(self, url: str) -> Optional[bytes]:
+        if self.disk_cache_dir is None:
+            return None
+        try:
+            with open(self._get_disk_path(url), "rb") as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    def _write_disk(self, url: str, data: bytes) -> None:
+        if self.disk_cache_dir is None:
+            return
+        path = self._get_disk_path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as file:
+            file.write(data)
+        os.replace(temp_path, path)
+
+    def get_bytes(self, url: str) -> bytes:
+        """Return the raw bytes behind a URL from memory, disk or the network, in that order."""
+        data = self.memory_cache.get(url)
+        if data is None:
+            data = self._read_disk(url)
+            if data is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                self.memory_cache.put(url, data)
+        if data is not None:
+            with self._lock:
+                self.bytes_saved += len(data)
+            return data
+
+        response = self.session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        data = response.content
+        with self._lock:
+            self.downloads += 1
+            self.bytes_downloaded += len(data)
+        self.memory_cache.put(url, data)
+        self._write_disk(url, data)
+        return data
+
+    def get_image(self, path: str, bbox: Optional[Tuple[float, float, float, float]] = None) -> Image.Image:
+        """Return the (cropped) image; callers get a copy they are free to modify."""
+        key = (path, tuple(bbox) if bbox is not None else None)
+        image = self.decoded_cache.get(key)
+        if image is None:
+            source = path
+            if is_blob_ref(path):
+                source = self.blob_store.get_path(path) if self.blob_store is not None else None
+                if source is None:
+                    raise ValueError(f"Unknown blob: {path}")
+            image = get_image_from_source(source, bbox, fetch_bytes=self.get_bytes)
+            image.load()
+            self.decoded_cache.put(key, image)
+        return image.copy()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "memory_cache": self.memory_cache.stats(),
+                "decoded_cache": self.decoded_cache.stats(),
+                "disk_hits": self.disk_hits,
+                "downloads": self.downloads,
+                "bytes_downloaded": self.bytes_downloaded,
+                "bytes_saved": self.bytes_saved,
+            }
+
+    def close(self) -> None:
+        self.session.close()
+
+
+def encode_image(
+    image: Image.Image,
+    max_edge: int = 1024,
+    image_format: Literal["jpeg", "webp"] = "jpeg",
+    quality: int = 85,
+) -> tuple[bytes, str]:
+    """Downscale so the longest edge is at most ``max_edge`` and encode lossy."""
+    image = image.convert("RGB")
+    if max(image.size) > max_edge:
+        image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+
+    buf = BytesIO()
+    image.save(buf, format=image_format.upper(), quality=quality)
+    return buf.getvalue(), f"image/{image_format}"
+
+
+class ImagePreparer:
+    """Turn image sources into compact provider payloads, caching the encoded bytes.
+
+    Entries are keyed by ``(path, bbox)``; the encoding settings are fixed per
+    instance, so they never need to be part of the key. ``prepare`` blocks on
+    fetching and re-encoding, so async callers run it in a thread.
+    """
+
+    def __init__(
+        self,
+        fetcher: ImageFetcher,
+        max_edge: int = 1024,
+        image_format: Literal["jpeg", "webp"] = "jpeg",
+        quality: int = 85,
+        cache_bytes: int = 64 * 1024 * 1024,
+    ):
+        self.fetcher = fetcher
+        self.max_edge = max_edge
+        self.image_format = image_format
+        self.quality = quality
+        self.cache = LRUCache(cache_bytes, sizeof=lambda prepared: len(prepared.data))
+
+        self._lock = threading.Lock()
+        self.original_bytes = 0
+        self.prepared_bytes = 0
+
+    def prepare(self, path: str, bbox: Optional[Tuple[float, float, float, float]] = None) -> PreparedImage:
+        key = (path, tuple(bbox) if bbox is not None else None)
+        prepared = self.cache.get(key)
+        if prepared is None:
+            image = self.fetcher.get_image(path, bbox)
+            data, mime_type = encode_image(image, self.max_edge, self.image_format, self.quality)
+            prepared = PreparedImage(data=data, mime_type=mime_type, original_bytes=get_image_nbytes(image))
+            self.cache.put(key, prepared)
+
+        with self._lock:
+            self.original_bytes += prepared.original_bytes
+            self.prepared_bytes += len(prepared.data)
+        return prepared
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "cache": self.cache.stats(),
+                **summarize_payload_sizes(self.original_bytes, self.prepared_bytes),
+            }
+
+
+def summarize_payload_sizes(original_bytes: int, prepared_bytes: int) -> dict:
+    return {
+        "original_bytes": original_bytes,
+        "prepared_bytes": prepared_bytes,
+        "reduction": 1 - prepared_bytes / original_bytes if original_bytes else 0.0,
+    }
+
+
+def get_payload_report(prepared_images: list[PreparedImage]) -> dict:
+    """Payload size of one provider request compared with the uncompressed crops."""
+    return {
+        "images": len(prepared_images),
+        **summarize_payload_sizes(
+            sum(prepared.original_bytes for prepared in prepared_images),
+            sum(len(prepared.data) for prepared in prepared_images),
+        ),
+    }
+
+
+def download_bytes(url: str, timeout: float = 10.0) -> bytes:
+    response = requests.get(url, timeout=timeout)
+    response.raise_for_status()
+    return response.content
+
+
+def get_image_from_source(
+    path: str,
+    bbox: Optional[Tuple[float, float, float, float]] = None,
+    fetch_bytes: Callable[[str], bytes] = download_bytes,
+) -> Image.Image:
     if path.startswith("data:image"):
         encoded = path.split(",")[1]
         image_bytes = base64.b64decode(encoded)
         image = Image.open(BytesIO(image_bytes))
     elif urlparse(path).scheme in ("http", "https"):
-        response = requests.get(path)
-        image = Image.open(BytesIO(response.content))
+        image = Image.open(BytesIO(fetch_bytes(path)))
     elif os.path.exists(path):
         image = Image.open(path)
     else:
@@ -25,6 +254,13 @@ def get_image_from_source(path: str, bbox: Optional[Tuple[float, float, float, f
     return image
 
 
+def get_image_digest(image: Image.Image) -> str:
+    """Hash the decoded pixels, so the same image gets the same digest whatever its source."""
+    digest = hashlib.sha256(f"{image.mode}:{image.size}".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
 def pil_to_base64_png(img: Image.Image):
     buf = BytesIO()
     img.save(buf, format="PNG")
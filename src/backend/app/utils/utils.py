@@ -40,7 +40,7 @@ def parse_function_definition(function_def: str) -> Dict[str, Any]:
 
     # parse the function using AST
     tree = ast.parse(function_def.strip())
-    if not tree.body or not isinstance(tree.body[0], ast.FunctionDef):
+    if not tree.body or not isinstance(tree.body[0], (ast.FunctionDef, ast.AsyncFunctionDef)):
         return result
 
     func = tree.body[0]
@@ -67,6 +67,9 @@ def parse_function_definition(function_def: str) -> Dict[str, Any]:
     for i, arg in enumerate(args.args):
         if arg.arg == 'self':
             continue
+        # the run config is injected by the tool node, not chosen by the agent
+        if arg.annotation is not None and ast.unparse(arg.annotation) == 'RunnableConfig':
+            continue
 
         param_info = {
             "type": get_type_from_annotation(arg.annotation) if arg.annotation else "string",
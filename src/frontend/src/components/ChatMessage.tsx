@@ -1,4 +1,5 @@
 import { Message } from "@/types";
+import { resolveImageUrl } from "@/lib/api";
 
 interface ChatMessageProps {
     message: Message;
@@ -21,7 +22,7 @@ export default function ChatMessage({ message }: ChatMessageProps) {
                         {message.images.map((img) => (
                             <img
                                 key={img.image_id}
-                                src={img.url}
+                                src={resolveImageUrl(img.url)}
                                 alt={`${img.type} image`}
                                 className="h-24 w-24 rounded-lg object-cover"
                             />
@@ -2,6 +2,11 @@ import { ChatRequest, ChatResponse, SessionDataResponse } from "@/types";
 
 const API_BASE_URL = "http://localhost:8000";
 
+// stored images come back as paths served by the backend, e.g. /images/<digest>.png
+export function resolveImageUrl(url: string): string {
+    return url.startsWith("/") ? `${API_BASE_URL}${url}` : url;
+}
+
 export async function fileToBase64(file: File): Promise<string> {
     return new Promise((resolve, reject) => {
         const reader = new FileReader();
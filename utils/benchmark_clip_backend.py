@@ -0,0 +1,81 @@
+"""Compare the fp32 CLIP text tower with the int8 TorchScript CPU backend.
+
+Run from the repository root so the backend package can be imported:
+
+    uv run python -m utils.benchmark_clip_backend --num_threads 4
+"""
+import argparse
+import json
+import time
+import numpy as np
+import torch
+
+from src.backend.app.services.clip import load_clip_model, load_text_encoder
+
+
+def encode(model, processor, texts: list[str]) -> np.ndarray:
+    text_inputs = processor.tokenizer(text=texts, return_tensors="pt", padding=True)
+    with torch.no_grad():
+        text_features = model.get_text_features(
+            text_inputs["input_ids"].to(model.device),
+            text_inputs["attention_mask"].to(model.device),
+        )
+    return text_features.cpu().numpy()
+
+
+def measure_latency(model, processor, texts: list[str], runs: int = 20) -> dict:
+    encode(model, processor, texts)  # warm up
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        encode(model, processor, texts)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {
+        "median_ms": round(float(np.median(latencies)), 2),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+    }
+
+
+def cosine_agreement(reference: np.ndarray, candidate: np.ndarray) -> dict:
+    reference = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    candidate = candidate / np.linalg.norm(candidate, axis=1, keepdims=True)
+    cosine = (reference * candidate).sum(axis=1)
+    return {
+        "mean_cosine": round(float(cosine.mean()), 4),
+        "min_cosine": round(float(cosine.min()), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the CLIP text encoding backends on CPU")
+    parser.add_argument("--clip_model_name", type=str, default="patrickjohncyh/fashion-clip", help="The name of the CLIP model")
+    parser.add_argument("--phrases_path", type=str, default="./data/example/garment_phrases.txt", help="The file of phrases to encode, one per line")
+    parser.add_argument("--batch_sizes", type=int, nargs="*", default=[1, 8, 32], help="The batch sizes to time")
+    parser.add_argument("--runs", type=int, default=20, help="The number of timed runs per batch size")
+    parser.add_argument("--num_threads", type=int, default=None, help="The number of intra-op CPU threads")
+    args = parser.parse_args()
+
+    with open(args.phrases_path, "r") as file:
+        phrases = [line.strip() for line in file if line.strip()]
+
+    model, processor = load_clip_model(args.clip_model_name, device="cpu", num_threads=args.num_threads)
+    backends = {
+        "torch": load_text_encoder(model, processor, backend="torch"),
+        "torchscript_int8": load_text_encoder(model, processor, backend="torchscript_int8"),
+    }
+
+    report = {"threads": torch.get_num_threads(), "latency": {}, "agreement": {}}
+    for name, encoder in backends.items():
+        report["latency"][name] = {
+            batch_size: measure_latency(encoder, processor, (phrases * batch_size)[:batch_size], runs=args.runs)
+            for batch_size in args.batch_sizes
+        }
+
+    reference = encode(backends["torch"], processor, phrases)
+    report["agreement"]["torchscript_int8"] = cosine_agreement(reference, encode(backends["torchscript_int8"], processor, phrases))
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Measure the per-request cost of setting up the agent graph.
+
+Compares building the tool list, tool descriptions and compiled graph on every
+request (the previous behaviour) with reusing the graph compiled at import and
+only assembling the run config.
+
+Run from the repository root so the backend package can be imported:
+
+    uv run python -m utils.benchmark_graph_setup --runs 200
+"""
+import argparse
+import json
+import time
+import numpy as np
+
+from src.backend.app.services.graph import TOOLS, build_graph, get_available_tool_descriptions, graph
+from src.backend.app.utils.utils import get_tool_descriptions
+
+
+def setup_per_request():
+    return build_graph(), get_tool_descriptions(TOOLS)
+
+
+def setup_compiled_once():
+    config = {
+        "configurable": {
+            "session_id": "benchmark",
+            "vector_store": None,
+            "clip_text_model": None,
+            "clip_processor": None,
+            "clip_model": None,
+        }
+    }
+    return graph, get_available_tool_descriptions(), config
+
+
+def measure_latency(setup, runs: int = 200) -> dict:
+    setup()  # warm up
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        setup()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {
+        "median_ms": round(float(np.median(latencies)), 4),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the per-request agent graph setup")
+    parser.add_argument("--runs", type=int, default=200, help="The number of timed setups per variant")
+    args = parser.parse_args()
+
+    report = {
+        "per_request": measure_latency(setup_per_request, runs=args.runs),
+        "compiled_once": measure_latency(setup_compiled_once, runs=args.runs),
+    }
+    report["saved_ms_per_request"] = round(report["per_request"]["median_ms"] - report["compiled_once"]["median_ms"], 4)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Check LocalVectorStore search against a tiny embedding cache, without Qdrant or CLIP.
+
+The cache is written with the ingestion script's own EmbeddingCache, so this
+also checks that the two agree on the on-disk format, including the id list
+that keeps another dataset in the same cache out of the collection. Exits
+non-zero when a check fails.
+
+Run from the repository root so the backend package can be imported:
+
+    uv run python -m utils.check_local_vector_store
+"""
+import asyncio
+import json
+import sys
+import tempfile
+import numpy as np
+
+from src.backend.app.services.vector_store import LocalVectorStore
+from utils.create_collection_ctl import EmbeddingCache
+
+CLIP_MODEL_NAME = "check/local-vector-store"
+COLLECTION_NAME = "check"
+
+# id -> (vector, label); cosine similarity to the query [1, 0, 0, 0] falls from a to f
+POINTS = {
+    "a": ([1.0, 0.0, 0.0, 0.0], "Shoes"),
+    "b": ([0.9, 0.1, 0.0, 0.0], "Pants"),
+    "c": ([0.7, 0.3, 0.0, 0.0], "Shoes"),
+    "d": ([0.5, 0.5, 0.0, 0.0], "Pants"),
+    "e": ([0.2, 0.8, 0.0, 0.0], "Shoes"),
+    "f": ([0.0, 0.0, 1.0, 0.0], "Bags"),
+}
+
+# embedded into the same cache for another collection; would rank first if it leaked in
+OTHER_POINTS = {
+    "x": ([1.0, 0.0, 0.0, 0.0], "Hats"),
+}
+
+
+def get_points(points: dict) -> list[dict]:
+    return [
+        {
+            "id": point_id,
+            "vector": np.asarray(vector, dtype=np.float32),
+            "payload": {"image_url": f"https://example.com/{point_id}.jpg", "bbox": [0, 0, 1, 1], "label": label},
+        }
+        for point_id, (vector, label) in points.items()
+    ]
+
+
+def build_cache(directory: str) -> str:
+    cache = EmbeddingCache(directory, CLIP_MODEL_NAME, dim=4)
+    cache.add(get_points(OTHER_POINTS))
+    cache.add(get_points(POINTS))
+    cache.reset_collection(COLLECTION_NAME)
+    cache.add_to_collection(COLLECTION_NAME, POINTS)
+    cache.add_to_collection("other", OTHER_POINTS)
+    return cache.path
+
+
+def get_ids(results: list) -> list[str]:
+    return [item.point_id for item in results]
+
+
+async def run_checks(store: LocalVectorStore) -> list[str]:
+    problems = []
+
+    def check(name: str, actual, expected) -> None:
+        if actual != expected:
+            problems.append(f"{name}: expected {expected!r}, got {actual!r}")
+
+    query = [1.0, 0.0, 0.0, 0.0]
+
+    [results] = await store.search_batch([query], top_k=3)
+    check("top-k ordering", get_ids(results), ["a", "b", "c"])
+    scores = [item.score for item in results]
+    check("scores descending", scores, sorted(scores, reverse=True))
+    check("identical vector scores 1", round(scores[0], 3), 1.0)
+
+    [results] = await store.search_batch([[10.0, 0.0, 0.0, 0.0]], top_k=3)
+    check("cosine ignores query scale", get_ids(results), ["a", "b", "c"])
+
+    [results] = await store.search_batch([query], top_k=100)
+    check("top_k larger than the store", len(results), len(POINTS))
+
+    [results] = await store.search_batch([query], top_k=2, labels=["Pants"])
+    check("label filter", get_ids(results), ["b", "d"])
+    check("label filter labels", [item.label for item in results], ["Pants", "Pants"])
+
+    [results] = await store.search_batch([query], top_k=3, labels=["Coats & Jackets"])
+    check("label with no items", results, [])
+
+    batch = await store.search_batch([query, [0.0, 1.0, 0.0, 0.0]], top_k=1, labels=[None, "Shoes"])
+    check("mixed filtered and unfiltered batch", [get_ids(results) for results in batch], [["a"], ["e"]])
+
+    check("labels", await store.get_labels(), ["Bags", "Pants", "Shoes"])
+
+    [results] = await store.search_batch([query], top_k=1)
+    check("payload", (results[0].image_source.path, tuple(results[0].image_source.bbox)), ("https://example.com/a.jpg", (0, 0, 1, 1)))
+    return problems
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        # a block size smaller than the store exercises the blocked scoring
+        path = build_cache(directory)
+        store = LocalVectorStore(path, collection_name=COLLECTION_NAME, block_size=4)
+        problems = asyncio.run(run_checks(store))
+        if len(LocalVectorStore(path)) != len(POINTS) + len(OTHER_POINTS):
+            problems.append("without a collection name every cached row is served")
+        try:
+            LocalVectorStore(path, collection_name="missing")
+            problems.append("a collection without an id list loads")
+        except FileNotFoundError:
+            pass
+
+    print(json.dumps({"points": len(POINTS), "problems": problems}, indent=2))
+    if problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,23 @@
 from PIL import Image
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from transformers import CLIPProcessor, CLIPModel
 import torch
 from io import BytesIO
 from itertools import batched
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor
+import queue
+import threading
+import time
+import json
+import uuid
 import pandas as pd
 import argparse
-from typing import Optional, Tuple
+from typing import Iterable, Iterator, Optional, Tuple, TypeVar
 import os
 
 from qdrant_client import QdrantClient
@@ -15,78 +26,776 @@ from qdrant_client import models
 
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
+T = TypeVar("T")
+_END_OF_STAGE = object()
 
-def get_image_features_from_df(
+# Qdrant's default optimizer indexing_threshold, in KB
+DEFAULT_INDEXING_THRESHOLD = 10000
+
+# fixed namespace so the same (image_signature, bbox) always maps to the same point id
+POINT_ID_NAMESPACE = uuid.UUID("8f1d2c1e-6b7a-4f0e-9a51-3c2d7e5b9f40")
+
+
+class StageProfiler:
+    """Thread-safe per-stage counters for the ingestion pipeline.
+
+    Failures are always counted. Busy time per stage and queue depths are only
+    recorded when ``enabled`` is set, i.e. with ``--profile``.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._started_at = time.perf_counter()
+        self._items: dict[str, int] = defaultdict(int)
+        self._seconds: dict[str, float] = defaultdict(float)
+        self._failures: dict[str, int] = defaultdict(int)
+        self._queue_depths: dict[str, list[int]] = defaultdict(list)
+        self._queue_sizes: dict[str, int] = {}
+
+    def start(self, enabled: bool = True) -> None:
+        """Enable or disable timing and restart the wall clock used for throughput."""
+        self.enabled = enabled
+        self._started_at = time.perf_counter()
+
+    @contextmanager
+    def measure(self, stage: str, items: int = 1):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start, items)
+
+    def add(self, stage: str, seconds: float, items: int = 1) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._seconds[stage] += seconds
+            self._items[stage] += items
+
+    def fail(self, stage: str, items: int = 1) -> None:
+        with self._lock:
+            self._failures[stage] += items
+
+    def sample_queue(self, name: str, depth: int, size: int) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._queue_depths[name].append(depth)
+            self._queue_sizes[name] = size
+
+    @property
+    def failures(self) -> dict[str, int]:
+        return dict(self._failures)
+
+    def summary(self) -> dict:
+        elapsed = time.perf_counter() - self._started_at
+        with self._lock:
+            stages = {
+                stage: {
+                    "items": self._items[stage],
+                    "busy_seconds": round(self._seconds[stage], 3),
+                    "items_per_busy_second": round(self._items[stage] / max(self._seconds[stage], 1e-9), 1),
+                    "items_per_second": round(self._items[stage] / max(elapsed, 1e-9), 1),
+                }
+                for stage in self._items
+            }
+            queues = {
+                name: {
+                    "size": self._queue_sizes[name],
+                    "mean_depth": round(sum(depths) / len(depths), 2),
+                    "max_depth": max(depths),
+                }
+                for name, depths in self._queue_depths.items()
+            }
+            return {
+                "elapsed_seconds": round(elapsed, 3),
+                "stages": stages,
+                "queues": queues,
+                "failures": dict(self._failures),
+            }
+
+
+profiler = StageProfiler()
+
+
+class _StageError:
+    def __init__(self, exception: BaseException):
+        self.exception = exception
+
+
+def run_in_background(iterable: Iterable[T], queue_size: int = 4, name: Optional[str] = None) -> Iterator[T]:
+    """Drive ``iterable`` from a background thread through a bounded queue.
+
+    Chaining several stages this way lets them overlap while keeping at most
+    ``queue_size`` items buffered between any two of them. Errors raised by the
+    stage are re-raised in the consumer.
+    """
+    buffer = queue.Queue(maxsize=queue_size)
+
+    def worker():
+        try:
+            for item in iterable:
+                if name is not None:
+                    profiler.sample_queue(name, buffer.qsize(), queue_size)
+                buffer.put(item)
+        except BaseException as e:
+            buffer.put(_StageError(e))
+        else:
+            buffer.put(_END_OF_STAGE)
+
+    threading.Thread(target=worker, daemon=True).start()
+    while True:
+        item = buffer.get()
+        if item is _END_OF_STAGE:
+            return
+        if isinstance(item, _StageError):
+            raise item.exception
+        yield item
+
+
+def get_point_id(image_signature: str, bbox: Optional[Tuple[float, float, float, float]]) -> str:
+    """Derive a stable Qdrant point id from the source image and the item's bbox."""
+    bbox_key = ",".join(f"{float(v):g}" for v in bbox) if bbox is not None else ""
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, f"{image_signature}:{bbox_key}"))
+
+
+def read_jsonl_chunks(
+    data_path: str,
+    chunk_size: int = 1000,
+    skip_rows: int = 0,
+) -> Iterator[tuple[int, pd.DataFrame]]:
+    """Read a CTL .jsonl file in chunks without splitting an image across chunks.
+
+    Rows of the same ``image_signature`` are expected to be contiguous, as in the
+    CTL dumps; the trailing run of each chunk is carried over to the next one.
+    Yields ``(rows_done, chunk)`` where ``rows_done`` is the number of rows of the
+    file read up to the end of the chunk. Each chunk carries a ``point_id``
+    column, and the first ``skip_rows`` rows of the file are dropped.
+    """
+    carry = None
+    rows_read = 0
+    with pd.read_json(data_path, orient="records", lines=True, chunksize=chunk_size) as reader:
+        start = time.perf_counter()
+        for chunk in reader:
+            profiler.add("read", time.perf_counter() - start, len(chunk))
+            rows_read += len(chunk)
+            if carry is not None:
+                chunk = pd.concat([carry, chunk], ignore_index=True)
+
+            image_signatures = chunk["image_signature"].to_numpy()
+            split = len(image_signatures)
+            while split > 0 and image_signatures[split - 1] == image_signatures[-1]:
+                split -= 1
+
+            carry = chunk.iloc[split:]
+            if split > 0:
+                rows_done = rows_read - len(carry)
+                yield rows_done, prepare_chunk(chunk.iloc[:split], rows_done, skip_rows)
+            start = time.perf_counter()
+
+    if carry is not None and len(carry) > 0:
+        yield rows_read, prepare_chunk(carry, rows_read, skip_rows)
+
+
+def prepare_chunk(chunk: pd.DataFrame, rows_done: int, skip_rows: int = 0) -> pd.DataFrame:
+    rows_to_skip = max(0, skip_rows - (rows_done - len(chunk)))
+    chunk = chunk.iloc[rows_to_skip:].reset_index(drop=True)
+    point_ids = [get_point_id(image_signature, bbox) for image_signature, bbox in zip(chunk["image_signature"], chunk["bbox"])]
+    return chunk.assign(point_id=point_ids)
+
+
+def skip_existing_points(
+    chunks: Iterable[tuple[int, pd.DataFrame]],
+    client: QdrantClient,
+    collection_name: str,
+) -> Iterator[tuple[int, pd.DataFrame]]:
+    """Drop rows whose point is already in the collection before anything is fetched.
+
+    Chunks are yielded even when every row is dropped, so progress can still be
+    checkpointed.
+    """
+    for rows_done, chunk in chunks:
+        if len(chunk) > 0:
+            existing = client.retrieve(
+                collection_name=collection_name,
+                ids=chunk["point_id"].tolist(),
+                with_payload=False,
+                with_vectors=False,
+            )
+            existing_ids = {str(point.id) for point in existing}
+            chunk = chunk[~chunk["point_id"].isin(existing_ids)].reset_index(drop=True)
+        yield rows_done, chunk
+
+
+def load_checkpoint(checkpoint_path: str, collection_name: str, data_path: str) -> int:
+    """Return the number of rows already upserted by an interrupted run, or 0."""
+    if not os.path.exists(checkpoint_path):
+        return 0
+
+    with open(checkpoint_path, "r") as file:
+        checkpoint = json.load(file)
+    if checkpoint["collection_name"] != collection_name or checkpoint["data_path"] != os.path.abspath(data_path):
+        raise ValueError(f"Checkpoint {checkpoint_path} belongs to a different collection or data file")
+    return checkpoint["rows_done"]
+
+
+def save_checkpoint(checkpoint_path: str, collection_name: str, data_path: str, rows_done: int) -> None:
+    tmp_path = f"{checkpoint_path}.tmp"
+    with open(tmp_path, "w") as file:
+        json.dump({
+            "collection_name": collection_name,
+            "data_path": os.path.abspath(data_path),
+            "rows_done": rows_done,
+        }, file)
+    os.replace(tmp_path, checkpoint_path)
+
+
+class EmbeddingCache:
+    """Append-only on-disk store of image embeddings for one CLIP model.
+
+    Vectors are kept as raw float16 rows in ``embeddings.f16`` and read back
+    through a memory map; line ``i`` of ``payloads.jsonl`` holds the point id and
+    payload of row ``i``. A store lives in ``<cache_dir>/<clip_model_name>``, so
+    entries are keyed by ``(image_signature, bbox, clip_model_name)``.
+
+    The store is shared by every dataset embedded with the model, so the ids
+    uploaded to each collection are listed in ``collections/<collection_name>.ids``.
+    """
+
+    def __init__(self, cache_dir: str, clip_model_name: str, dim: Optional[int] = None):
+        self.path = os.path.join(cache_dir, clip_model_name.replace("/", "__"))
+        self._vectors_path = os.path.join(self.path, "embeddings.f16")
+        self._payloads_path = os.path.join(self.path, "payloads.jsonl")
+        meta_path = os.path.join(self.path, "meta.json")
+
+        if os.path.exists(meta_path):
+            with open(meta_path, "r") as file:
+                meta = json.load(file)
+            if dim is not None and meta["dim"] != dim:
+                raise ValueError(f"Embedding cache {self.path} has dim {meta['dim']}, expected {dim}")
+            self.dim = meta["dim"]
+        elif dim is None:
+            raise FileNotFoundError(f"Embedding cache {self.path} not found")
+        else:
+            os.makedirs(self.path, exist_ok=True)
+            with open(meta_path, "w") as file:
+                json.dump({"clip_model_name": clip_model_name, "dim": dim, "dtype": "float16"}, file)
+            self.dim = dim
+
+        self._lock = threading.Lock()
+        self._row_of: dict[str, int] = {}
+        # rows in the files; the index into the memory map, not the number of distinct ids
+        self._num_rows = 0
+        self._recover()
+        self._vectors: Optional[np.memmap] = None
+
+    def _recover(self) -> None:
+        """Index the stored rows, dropping a partially written tail left by a crash."""
+        payload_bytes = 0
+        if os.path.exists(self._payloads_path):
+            with open(self._payloads_path, "rb") as file:
+                for line in file:
+                    try:
+                        point_id = json.loads(line)["id"]
+                    except ValueError:
+                        break
+                    self._row_of.setdefault(point_id, self._num_rows)
+                    self._num_rows += 1
+                    payload_bytes += len(line)
+
+        for path, size in ((self._payloads_path, payload_bytes), (self._vectors_path, len(self) * self.dim * 2)):
+            with open(path, "ab") as file:
+                file.truncate(size)
+
+    def __len__(self) -> int:
+        return self._num_rows
+
+    def __contains__(self, point_id: str) -> bool:
+        return point_id in self._row_of
+
+    def add(self, points: list[dict]) -> None:
+        with self._lock:
+            # a point id repeated within the batch is written once
+            unique_points = {}
+            for point in points:
+                if point["id"] not in self._row_of:
+                    unique_points.setdefault(point["id"], point)
+            points = list(unique_points.values())
+            if not points:
+                return
+
+            vectors = np.stack([point["vector"] for point in points]).astype(np.float16)
+            with open(self._vectors_path, "ab") as file:
+                file.write(vectors.tobytes())
+            with open(self._payloads_path, "a") as file:
+                for point in points:
+                    file.write(json.dumps({"id": point["id"], **point["payload"]}) + "\n")
+
+            for point in points:
+                self._row_of[point["id"]] = self._num_rows
+                self._num_rows += 1
+
+    def get_collection_ids_path(self, collection_name: str) -> str:
+        return os.path.join(self.path, "collections", f"{collection_name}.ids")
+
+    def reset_collection(self, collection_name: str) -> None:
+        """Forget the ids listed for a collection, e.g. when it is created anew."""
+        ids_path = self.get_collection_ids_path(collection_name)
+        os.makedirs(os.path.dirname(ids_path), exist_ok=True)
+        open(ids_path, "w").close()
+
+    def add_to_collection(self, collection_name: str, point_ids: Iterable[str]) -> None:
+        """List point ids as uploaded to a collection; an id may be listed more than once."""
+        ids_path = self.get_collection_ids_path(collection_name)
+        os.makedirs(os.path.dirname(ids_path), exist_ok=True)
+        with open(ids_path, "a") as file:
+            file.writelines(f"{point_id}\n" for point_id in point_ids)
+
+    def _get_memmap(self) -> np.ndarray:
+        if len(self) == 0:
+            # an empty file cannot be memory-mapped
+            return np.empty((0, self.dim), dtype=np.float16)
+        if self._vectors is None or len(self._vectors) < len(self):
+            self._vectors = np.memmap(self._vectors_path, dtype=np.float16, mode="r", shape=(len(self), self.dim))
+        return self._vectors
+
+    def get_vectors(self, point_ids: Iterable[str]) -> np.ndarray:
+        with self._lock:
+            rows = [self._row_of[point_id] for point_id in point_ids]
+            if not rows:
+                return np.empty((0, self.dim), dtype=np.float16)
+            return self._get_memmap()[rows]
+
+    def iter_points(self, chunk_size: int = 1000, skip_rows: int = 0) -> Iterator[tuple[int, list[dict]]]:
+        """Yield ``(rows_done, points)`` straight from disk, without the model or the network.
+
+        Vectors are slices of the memory map, so no copy is made until upsert.
+        """
+        if len(self) == 0:
+            return
+        vectors = self._get_memmap()
+        with open(self._payloads_path, "r") as file:
+            rows = (json.loads(line) for line in file)
+            for start, batch in enumerate(batched(rows, chunk_size)):
+                start *= chunk_size
+                if start + len(batch) <= skip_rows:
+                    continue
+                points = []
+                for row, payload in enumerate(batch, start=start):
+                    if row < skip_rows:
+                        continue
+                    point_id = payload.pop("id")
+                    points.append({"id": point_id, "vector": vectors[row], "payload": payload})
+                yield start + len(batch), points
+
+
+def get_cropped_images_from_df(
+    executor: ThreadPoolExecutor,
+    session: requests.Session,
+    df: pd.DataFrame,
+    max_in_flight: int = 16,
+    timeout: float = 10.0,
+) -> list[Optional[Image.Image]]:
+    """Return one crop per row of ``df``, or ``None`` where the image could not be fetched."""
+
+    # one pass over the chunk; crops are placed back at their row positions
+    row_positions, image_groups = [], []
+    for _, group in df.reset_index(drop=True).groupby("image_signature", sort=False):
+        row_positions.append(group.index)
+        image_groups.append((group["image_url"].iat[0], group["bbox"].tolist()))
+
+    cropped_images = [None] * len(df)
+    crops_per_group = fetch_image_crops(executor, session, image_groups, max_in_flight=max_in_flight, timeout=timeout)
+    for positions, crops in zip(row_positions, crops_per_group):
+        for position, crop in zip(positions, crops):
+            cropped_images[position] = crop
+    return cropped_images
+
+
+def fetch_chunks(
+    chunks: Iterable[tuple[int, pd.DataFrame]],
+    session: requests.Session,
+    fetch_workers: int = 8,
+    timeout: float = 10.0,
+    cache: Optional[EmbeddingCache] = None,
+) -> Iterator[tuple[int, pd.DataFrame, pd.DataFrame, list[Image.Image]]]:
+    """Yield ``(rows_done, chunk, missing, crops)`` where only rows in ``missing`` were fetched.
+
+    Without a cache every row of the chunk is missing. Rows whose image failed to
+    download or decode are dropped from both ``chunk`` and ``missing``.
+    """
+    with ThreadPoolExecutor(max_workers=fetch_workers) as executor:
+        for rows_done, chunk in chunks:
+            missing = chunk
+            if cache is not None:
+                missing = chunk[[point_id not in cache for point_id in chunk["point_id"]]]
+            cropped_images = get_cropped_images_from_df(
+                executor,
+                session,
+                missing,
+                max_in_flight=2 * fetch_workers,
+                timeout=timeout,
+            )
+
+            fetched = [crop is not None for crop in cropped_images]
+            if not all(fetched):
+                failed_ids = set(missing["point_id"][[not ok for ok in fetched]])
+                chunk = chunk[~chunk["point_id"].isin(failed_ids)]
+                missing = missing[fetched]
+                cropped_images = [crop for crop in cropped_images if crop is not None]
+            yield rows_done, chunk, missing, cropped_images
+
+
+def embed_chunks(
     model: CLIPModel,
     processor: CLIPProcessor,
-    df: pd.DataFrame,
-) -> list[float]:
+    fetched_chunks: Iterable[tuple[int, pd.DataFrame, pd.DataFrame, list[Image.Image]]],
+    batch_size: int = 64,
+    mixed_precision: bool = False,
+    cache: Optional[EmbeddingCache] = None,
+) -> Iterator[tuple[int, list[dict]]]:
+    for rows_done, chunk, missing, cropped_images in fetched_chunks:
+        image_features = get_image_features(
+            model,
+            processor,
+            cropped_images,
+            batch_size=batch_size,
+            mixed_precision=mixed_precision,
+        )
+        points = get_points_from_df(missing, image_features)
+        if cache is not None:
+            cache.add(points)
+            points = get_points_from_df(chunk, cache.get_vectors(chunk["point_id"]))
+        yield rows_done, points
 
-    unique_image_signatures = df["image_signature"].unique()
-    image_features = []
-    for image_signature in unique_image_signatures:
-        img_url = df[df["image_signature"] == image_signature]["image_url"].values[0]
-        bboxes = df[df["image_signature"] == image_signature]["bbox"]
-        cropped_images = [get_single_image_from_url(img_url, bbox) for bbox in bboxes]
-        image_features.extend(get_image_features(model, processor, cropped_images))
-    return image_features
+
+def get_points_from_df(df: pd.DataFrame, image_features: np.ndarray) -> list[dict]:
+    points = []
+    for row, image_feature in zip(df.itertuples(index=False), image_features):
+        points.append({
+            "id": row.point_id,
+            "vector": image_feature,
+            "payload": {
+                "image_signature": row.image_signature,
+                "label": row.label,
+                "image_url": row.image_url,
+                "bbox": row.bbox
+            }
+        })
+    return points
 
 
 def get_image_features(
     model: CLIPModel,
     processor: CLIPProcessor,
     images: list[Image.Image],
-) -> list[float]:
+    batch_size: int = 64,
+    mixed_precision: bool = False,
+) -> np.ndarray:
+    """Embed crops in fixed-size batches, regardless of which image they came from.
+
+    With ``mixed_precision`` the forward pass runs under autocast (bfloat16 on CPU,
+    float16 on CUDA); the returned array is always float32.
+    """
+    autocast_dtype = torch.bfloat16 if device.type == "cpu" else torch.float16
+    image_features = []
+    for batch in batched(images, batch_size):
+        with profiler.measure("preprocess", len(batch)):
+            pixel_values = processor.image_processor.preprocess(list(batch), return_tensors="pt")['pixel_values'].to(device)
+        with profiler.measure("forward", len(batch)):
+            with torch.no_grad(), torch.autocast(device_type=device.type, dtype=autocast_dtype, enabled=mixed_precision):
+                batch_features = model.get_image_features(pixel_values)
+            image_features.append(batch_features.float().cpu().numpy())
+
+    if not image_features:
+        return np.empty((0, model.config.projection_dim), dtype=np.float32)
+    return np.concatenate(image_features)
 
-    pixel_values = processor.image_processor.preprocess(images, return_tensors="pt")['pixel_values'].to(device)
-    with torch.no_grad():
-        image_features = model.get_image_features(pixel_values)
-    return image_features.cpu().numpy().tolist()
+
+def create_http_session(pool_size: int = 8, max_retries: int = 3) -> requests.Session:
+    """Create a keep-alive HTTP session shared by all fetch workers."""
+    retry = Retry(
+        total=max_retries,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET",),
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
 
 
 def get_single_image_from_url(
     url: str,
-    bbox: Optional[Tuple[float, float, float, float]] = None,
+    session: requests.Session,
+    timeout: float = 10.0,
 ) -> Image.Image:
 
-    response = requests.get(url)
-    image = Image.open(BytesIO(response.content))
-    if bbox is not None:
-        return image.crop(bbox)
+    with profiler.measure("download"):
+        response = session.get(url, timeout=timeout)
+        response.raise_for_status()
+    with profiler.measure("decode"):
+        image = Image.open(BytesIO(response.content))
+        image.load()
     return image
 
 
+def crop_image(
+    image: Image.Image,
+    bboxes: Iterable[Optional[Tuple[float, float, float, float]]],
+) -> list[Image.Image]:
+    return [image.crop(bbox) if bbox is not None else image for bbox in bboxes]
+
+
+def fetch_and_crop(
+    session: requests.Session,
+    url: str,
+    bboxes: list[Optional[Tuple[float, float, float, float]]],
+    timeout: float = 10.0,
+) -> list[Image.Image]:
+    """Download and decode a source image once and return every crop taken from it.
+
+    A failed download or decode is counted and yields ``None`` for every crop, so
+    one bad URL does not stop the build.
+    """
+    try:
+        image = get_single_image_from_url(url, session, timeout)
+    except requests.RequestException:
+        profiler.fail("download", len(bboxes))
+        return [None] * len(bboxes)
+    except (OSError, Image.DecompressionBombError):
+        profiler.fail("decode", len(bboxes))
+        return [None] * len(bboxes)
+
+    with profiler.measure("crop", len(bboxes)):
+        return crop_image(image, bboxes)
+
+
+def fetch_image_crops(
+    executor: ThreadPoolExecutor,
+    session: requests.Session,
+    image_groups: Iterable[tuple[str, list[Tuple[float, float, float, float]]]],
+    max_in_flight: int = 16,
+    timeout: float = 10.0,
+) -> Iterator[list[Image.Image]]:
+    """Fetch source images concurrently and yield their crops in input order.
+
+    At most ``max_in_flight`` downloads are pending at once, so memory stays
+    bounded however many groups are passed in.
+    """
+    pending = deque()
+    for url, bboxes in image_groups:
+        pending.append(executor.submit(fetch_and_crop, session, url, bboxes, timeout))
+        if len(pending) >= max_in_flight:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def get_quantization_config(
+    quantization: Optional[str],
+) -> Optional[models.ScalarQuantization | models.BinaryQuantization]:
+    """Quantized vectors are kept in RAM so searches only touch the originals when rescoring."""
+    if quantization == "scalar":
+        return models.ScalarQuantization(scalar=models.ScalarQuantizationConfig(
+            type=models.ScalarType.INT8,
+            quantile=0.99,
+            always_ram=True,
+        ))
+    if quantization == "binary":
+        return models.BinaryQuantization(binary=models.BinaryQuantizationConfig(always_ram=True))
+    return None
+
+
 def create_collection(
     client: QdrantClient,
     collection_name: str,
-    data_to_embed: list[dict],
     embedding_length: int = 512,
-    batch_size: int = 100,
+    quantization: Optional[str] = None,
+    hnsw_m: Optional[int] = None,
+    hnsw_ef_construct: Optional[int] = None,
+    on_disk: bool = False,
+    payload_indexes: Iterable[str] = ("label", "image_signature"),
 ) -> None:
 
     try:
-        client.create_collection(collection_name=collection_name, vectors_config=VectorParams(
-            size=embedding_length,
-            distance=Distance.COSINE,
-        ))
+        client.create_collection(
+            collection_name=collection_name,
+            vectors_config=VectorParams(
+                size=embedding_length,
+                distance=Distance.COSINE,
+                on_disk=on_disk,
+            ),
+            hnsw_config=models.HnswConfigDiff(m=hnsw_m, ef_construct=hnsw_ef_construct),
+            quantization_config=get_quantization_config(quantization),
+        )
 
-        for batch in batched(data_to_embed, batch_size):
-            ids = [item["id"] for item in batch]
-            vectors = [item["vector"] for item in batch]
-            payloads = [item["payload"] for item in batch]
-            client.upsert(
+        for field_name in payload_indexes:
+            client.create_payload_index(
                 collection_name=collection_name,
-                points=models.Batch(
-                    ids=ids,
-                    vectors=vectors,
-                    payloads=payloads,
-                ),
+                field_name=field_name,
+                field_schema=models.PayloadSchemaType.KEYWORD,
             )
+    except Exception as e:
+        raise Exception(f"Error creating collection: {e}")
+
 
-        print(f"Collection {collection_name} created successfully")
+def upsert_batch(
+    client: QdrantClient,
+    collection_name: str,
+    batch: Iterable[dict],
+    wait: bool = True,
+) -> None:
 
+    try:
+        ids = [item["id"] for item in batch]
+        vectors = np.stack([item["vector"] for item in batch]).astype(np.float32).tolist()
+        payloads = [item["payload"] for item in batch]
+        client.upsert(
+            collection_name=collection_name,
+            points=models.Batch(
+                ids=ids,
+                vectors=vectors,
+                payloads=payloads,
+            ),
+            wait=wait,
+        )
     except Exception as e:
-        raise Exception(f"Error creating collection: {e}")
+        raise Exception(f"Error upserting points: {e}")
+
+
+class BulkUploader:
+    """Upsert batches from several worker threads without waiting for each acknowledgement.
+
+    Submitting blocks once ``max_in_flight`` batches are pending, so a slow server
+    applies back-pressure to the pipeline instead of growing memory. An
+    acknowledged batch is only accepted by Qdrant, not yet applied; ``flush``
+    resends the last batch with ``wait=True`` as a barrier, since Qdrant applies
+    a collection's updates in the order it accepted them.
+    """
+
+    def __init__(
+        self,
+        client: QdrantClient,
+        collection_name: str,
+        batch_size: int = 100,
+        workers: int = 4,
+        max_in_flight: Optional[int] = None,
+    ):
+        self.client = client
+        self.collection_name = collection_name
+        self.batch_size = batch_size
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._slots = threading.BoundedSemaphore(max_in_flight or 2 * workers)
+        self._lock = threading.Lock()
+        self.points_uploaded = 0
+        self._last_batch: Optional[tuple[dict, ...]] = None
+        self._started_at = time.perf_counter()
+        self._finished_at: Optional[float] = None
+
+    def submit(self, points: list[dict]) -> list[Future]:
+        futures = []
+        for batch in batched(points, self.batch_size):
+            self._slots.acquire()
+            future = self._executor.submit(self._upload, batch)
+            future.add_done_callback(lambda _: self._slots.release())
+            futures.append(future)
+        return futures
+
+    def _upload(self, batch: tuple[dict, ...]) -> None:
+        with profiler.measure("upsert", len(batch)):
+            upsert_batch(self.client, self.collection_name, batch, wait=False)
+        with self._lock:
+            self.points_uploaded += len(batch)
+            self._last_batch = batch
+
+    def flush(self) -> None:
+        """Block until every acknowledged batch has been applied by Qdrant.
+
+        Call once all submitted futures are done; re-upserting a batch is idempotent.
+        """
+        if self._last_batch is not None:
+            with profiler.measure("upsert", len(self._last_batch)):
+                upsert_batch(self.client, self.collection_name, self._last_batch, wait=True)
+        self._finished_at = time.perf_counter()
+
+    @property
+    def points_per_second(self) -> float:
+        finished_at = self._finished_at or time.perf_counter()
+        return self.points_uploaded / max(finished_at - self._started_at, 1e-9)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self) -> "BulkUploader":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def set_indexing_threshold(client: QdrantClient, collection_name: str, indexing_threshold: int) -> None:
+    client.update_collection(
+        collection_name=collection_name,
+        optimizers_config=models.OptimizersConfigDiff(indexing_threshold=indexing_threshold),
+    )
+
+
+def get_indexing_threshold(client: QdrantClient, collection_name: str) -> int:
+    """The indexing threshold to restore after the bulk load.
+
+    A threshold of 0 is what a build leaves behind when it is killed before
+    restoring the original, so Qdrant's default is restored in that case.
+    """
+    indexing_threshold = client.get_collection(collection_name).config.optimizer_config.indexing_threshold
+    if indexing_threshold == 0:
+        print(f"Collection {collection_name} has indexing disabled, restoring the default indexing threshold after the upload")
+    return indexing_threshold or DEFAULT_INDEXING_THRESHOLD
+
+
+def build_outfit_index(client: QdrantClient, collection_name: str, output_path: str, batch_size: int = 1000) -> int:
+    """Write every point's outfit-mates (items sharing its ``image_signature``) to a JSON file.
+
+    The collection is scrolled after the upload, payloads only, so the index also
+    covers points from earlier appends and resumed runs. A scroll only sees
+    applied points, so call it after ``BulkUploader.flush`` rather than straight
+    after ``wait=False`` upserts. Each outfit lists its
+    point ids once: ``{"points": {id: {label, image_url, bbox, outfit}}, "outfits":
+    {image_signature: [id, ...]}}``.
+    """
+    points, outfits = {}, defaultdict(list)
+    offset = None
+    while True:
+        records, offset = client.scroll(
+            collection_name,
+            limit=batch_size,
+            offset=offset,
+            with_payload=["image_signature", "label", "image_url", "bbox"],
+            with_vectors=False,
+        )
+        for record in records:
+            point_id = str(record.id)
+            points[point_id] = {
+                "label": record.payload["label"],
+                "image_url": record.payload["image_url"],
+                "bbox": record.payload["bbox"],
+                "outfit": record.payload["image_signature"],
+            }
+            outfits[record.payload["image_signature"]].append(point_id)
+        if offset is None:
+            break
+
+    temp_path = f"{output_path}.tmp"
+    with open(temp_path, "w") as file:
+        json.dump({"collection_name": collection_name, "points": points, "outfits": outfits}, file)
+    os.replace(temp_path, output_path)
+    return len(outfits)
 
 
 def main():
@@ -96,53 +805,170 @@ def main():
     parser.add_argument("--qdrant_url", type=str, default="http://localhost:6333", help="The URL of the Qdrant server")
     parser.add_argument("--clip_model_name", type=str, default="patrickjohncyh/fashion-clip", help="The name of the CLIP model")
     parser.add_argument("--batch_size", type=int, default=100, help="The batch size for the upsert")
+    parser.add_argument("--upload_workers", type=int, default=4, help="The number of parallel upsert workers")
+    parser.add_argument("--keep_indexing", action="store_true", help="Keep HNSW indexing enabled during the bulk load")
+    parser.add_argument("--fetch_workers", type=int, default=8, help="The number of concurrent image downloads")
+    parser.add_argument("--timeout", type=float, default=10.0, help="The timeout in seconds for each image download")
+    parser.add_argument("--chunk_size", type=int, default=1000, help="The number of rows read from the data file at a time")
+    parser.add_argument("--queue_size", type=int, default=4, help="The number of chunks buffered between pipeline stages")
+    parser.add_argument("--embed_batch_size", type=int, default=64, help="The number of crops per CLIP forward pass")
+    parser.add_argument("--mixed_precision", action="store_true", help="Run the CLIP forward pass under autocast")
+    parser.add_argument("--mode", choices=["create", "append"], default="create", help="Create a new collection or append rows missing from an existing one")
+    parser.add_argument("--checkpoint_path", type=str, default=None, help="The checkpoint file used to resume an interrupted build")
+    parser.add_argument("--embedding_cache_dir", type=str, default=None, help="The directory where computed embeddings are stored and reused")
+    parser.add_argument("--from_cache", action="store_true", help="Build the collection from the embedding cache only")
+    parser.add_argument("--quantization", choices=["scalar", "binary"], default=None, help="Quantize the stored vectors")
+    parser.add_argument("--hnsw_m", type=int, default=None, help="The number of edges per node in the HNSW graph")
+    parser.add_argument("--hnsw_ef_construct", type=int, default=None, help="The number of neighbours considered while building the HNSW graph")
+    parser.add_argument("--on_disk", action="store_true", help="Store the original vectors on disk instead of in RAM")
+    parser.add_argument("--profile", action="store_true", help="Report per-stage throughput, queue depths and failures as JSON")
+    parser.add_argument("--profile_output", type=str, default=None, help="The file the --profile summary is also written to")
+    parser.add_argument("--payload_indexes", nargs="*", default=["label", "image_signature"], help="The payload fields to build keyword indexes for")
+    parser.add_argument("--outfit_index_path", type=str, default=None, help="The file the outfit co-occurrence index is written to after the upload")
     args = parser.parse_args()
 
-    # initialize client and model
+    # initialize client
     client = QdrantClient(url=args.qdrant_url)
-    model = CLIPModel.from_pretrained(args.clip_model_name).to(device)
-    processor = CLIPProcessor.from_pretrained(args.clip_model_name)
+
+    if args.from_cache:
+        # rebuild from stored embeddings only: no data file, model or network needed
+        if args.embedding_cache_dir is None:
+            raise ValueError("--from_cache requires --embedding_cache_dir")
+        cache = EmbeddingCache(args.embedding_cache_dir, args.clip_model_name)
+        source_path = cache.path
+        embedding_length = cache.dim
+    else:
+        # check if data_path exists and is .jsonl file
+        if not os.path.exists(args.data_path):
+            raise FileNotFoundError(f"Data file {args.data_path} not found")
+        if not args.data_path.endswith(".jsonl"):
+            raise ValueError(f"Data file {args.data_path} is not a .jsonl file")
+
+        model = CLIPModel.from_pretrained(args.clip_model_name).to(device)
+        processor = CLIPProcessor.from_pretrained(args.clip_model_name)
+        session = create_http_session(pool_size=args.fetch_workers)
+        source_path = args.data_path
+        embedding_length = model.config.projection_dim
+        cache = None
+        if args.embedding_cache_dir is not None:
+            cache = EmbeddingCache(args.embedding_cache_dir, args.clip_model_name, dim=embedding_length)
+
+    # resume an interrupted build from its checkpoint
+    checkpoint_path = args.checkpoint_path or f"{args.collection_name}.checkpoint.json"
+    skip_rows = load_checkpoint(checkpoint_path, args.collection_name, source_path)
 
     # check if collection exists
-    if client.collection_exists(args.collection_name):
-        raise ValueError(f"Collection {args.collection_name} already exists")
-
-    # check if data_path exists and is .jsonl file
-    if not os.path.exists(args.data_path):
-        raise FileNotFoundError(f"Data file {args.data_path} not found")
-    if not args.data_path.endswith(".jsonl"):
-        raise ValueError(f"Data file {args.data_path} is not a .jsonl file")
-
-    df = pd.read_json(args.data_path, orient="records", lines=True)
-    image_features = get_image_features_from_df(model, processor, df)
-    embedding_length = len(image_features[0])
-
-    image_signatures = df["image_signature"].values
-    labels = df["label"].values
-    img_urls = df["image_url"].values
-    ids = [i for i in range(len(image_signatures))]
-
-    bboxes = df["bbox"].values
-    data_to_embed = []
-    for i, image_signature, label, image_feature, img_url, bbox in zip(ids, image_signatures, labels, image_features, img_urls, bboxes):
-        data_to_embed.append({
-            "id": i,
-            "vector": image_feature,
-            "payload": {
-                "image_signature": image_signature,
-                "label": label,
-                "image_url": img_url,
-                "bbox": bbox
-            }
-        })
+    if not client.collection_exists(args.collection_name):
+        if skip_rows > 0:
+            # the checkpointed rows went into a collection that has since been dropped
+            print(f"Collection {args.collection_name} no longer exists, ignoring checkpoint {checkpoint_path} and starting from row 0")
+            skip_rows = 0
+        create_collection(
+            client,
+            args.collection_name,
+            embedding_length=embedding_length,
+            quantization=args.quantization,
+            hnsw_m=args.hnsw_m,
+            hnsw_ef_construct=args.hnsw_ef_construct,
+            on_disk=args.on_disk,
+            payload_indexes=args.payload_indexes,
+        )
+        if cache is not None:
+            cache.reset_collection(args.collection_name)
+    elif args.mode == "create" and skip_rows == 0:
+        raise ValueError(f"Collection {args.collection_name} already exists, use --mode append to sync new rows")
+    if skip_rows > 0:
+        print(f"Resuming {args.collection_name} from row {skip_rows}")
 
-    create_collection(
-        client=client,
-        collection_name=args.collection_name,
-        data_to_embed=data_to_embed,
-        embedding_length=embedding_length,
-        batch_size=args.batch_size,
-    )
+    if args.from_cache:
+        embedded_chunks = run_in_background(
+            cache.iter_points(args.chunk_size, skip_rows=skip_rows),
+            args.queue_size,
+            name="cache->upsert",
+        )
+    else:
+        # reader -> fetch -> embed stages, each overlapping the next through a bounded queue
+        chunks = read_jsonl_chunks(args.data_path, args.chunk_size, skip_rows=skip_rows)
+        if args.mode == "append":
+            chunks = skip_existing_points(chunks, client, args.collection_name)
+        chunks = run_in_background(chunks, args.queue_size, name="read->fetch")
+        fetched_chunks = run_in_background(
+            fetch_chunks(chunks, session, fetch_workers=args.fetch_workers, timeout=args.timeout, cache=cache),
+            args.queue_size,
+            name="fetch->embed",
+        )
+        embedded_chunks = run_in_background(
+            embed_chunks(
+                model,
+                processor,
+                fetched_chunks,
+                batch_size=args.embed_batch_size,
+                mixed_precision=args.mixed_precision,
+                cache=cache,
+            ),
+            args.queue_size,
+            name="embed->upsert",
+        )
+
+    profiler.start(enabled=args.profile)
+
+    # build the HNSW index once after the bulk load rather than while points arrive
+    indexing_threshold = get_indexing_threshold(client, args.collection_name)
+    if not args.keep_indexing:
+        set_indexing_threshold(client, args.collection_name, 0)
+
+    try:
+        with BulkUploader(
+            client,
+            args.collection_name,
+            batch_size=args.batch_size,
+            workers=args.upload_workers,
+        ) as uploader:
+            # a chunk is checkpointed once it and every chunk before it are accepted;
+            # accepted updates are in Qdrant's write-ahead log and survive a restart
+            pending = deque()
+            for rows_done, points in embedded_chunks:
+                pending.append((rows_done, uploader.submit(points)))
+                if cache is not None:
+                    cache.add_to_collection(args.collection_name, (point["id"] for point in points))
+                while pending and all(future.done() for future in pending[0][1]):
+                    rows_done, futures = pending.popleft()
+                    for future in futures:
+                        future.result()
+                    save_checkpoint(checkpoint_path, args.collection_name, source_path, rows_done)
+
+            rows_done = None
+            while pending:
+                rows_done, futures = pending.popleft()
+                for future in futures:
+                    future.result()
+
+            # the final checkpoint, the throughput and everything below need the points applied
+            uploader.flush()
+            if rows_done is not None:
+                save_checkpoint(checkpoint_path, args.collection_name, source_path, rows_done)
+    finally:
+        if not args.keep_indexing:
+            set_indexing_threshold(client, args.collection_name, indexing_threshold)
+
+    print(f"Uploaded {uploader.points_uploaded} points at {uploader.points_per_second:.1f} points/sec")
+    if profiler.failures:
+        print(f"Skipped items that could not be fetched: {profiler.failures}")
+    if args.profile:
+        summary = json.dumps(profiler.summary(), indent=2)
+        print(summary)
+        if args.profile_output is not None:
+            with open(args.profile_output, "w") as file:
+                file.write(summary)
+
+    # the uploader was flushed above, so the scroll sees every point of this run
+    if args.outfit_index_path is not None:
+        num_outfits = build_outfit_index(client, args.collection_name, args.outfit_index_path)
+        print(f"Wrote {num_outfits} outfits to {args.outfit_index_path}")
+
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    print(f"Collection {args.collection_name} synced successfully")
 
 
 if __name__ == "__main__":
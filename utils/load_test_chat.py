@@ -0,0 +1,81 @@
+"""Load test /chat with concurrent sessions against a single running worker.
+
+Each level sends ``--requests`` chats, ``concurrency`` at a time, each from its
+own session so turns are not serialized by the per-session lock. On a fully
+async worker throughput should grow with concurrency until the LLM providers
+or the CLIP executor saturate.
+
+Start one worker, then run from the repository root:
+
+    uv run uvicorn src.backend.app.main:app --workers 1
+    uv run python -m utils.load_test_chat --concurrency 1 4 16
+"""
+import argparse
+import asyncio
+import json
+import time
+import httpx
+import numpy as np
+
+
+async def send_chat(client: httpx.AsyncClient, query: str) -> tuple[float, bool]:
+    start = time.perf_counter()
+    try:
+        response = await client.post("/chat", json={"query": query})
+        ok = response.status_code == 200
+    except httpx.HTTPError:
+        ok = False
+    return (time.perf_counter() - start) * 1000, ok
+
+
+async def run_level(base_url: str, query: str, concurrency: int, num_requests: int, timeout: float) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+
+        async def bounded_chat() -> tuple[float, bool]:
+            async with semaphore:
+                return await send_chat(client, query)
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*[bounded_chat() for _ in range(num_requests)])
+        elapsed = time.perf_counter() - start
+
+    latencies = [latency for latency, ok in results if ok]
+    return {
+        "requests": num_requests,
+        "errors": sum(not ok for _, ok in results),
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(len(latencies) / elapsed, 3),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 1) if latencies else None,
+        "p95_ms": round(float(np.percentile(latencies, 95)), 1) if latencies else None,
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    report = {}
+    for concurrency in args.concurrency:
+        num_requests = max(args.requests, concurrency)
+        report[concurrency] = await run_level(args.base_url, args.query, concurrency, num_requests, args.timeout)
+
+    baseline = report[args.concurrency[0]]["throughput_rps"]
+    for level in report.values():
+        level["speedup"] = round(level["throughput_rps"] / baseline, 2) if baseline else None
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the /chat endpoint of a single worker")
+    parser.add_argument("--base_url", type=str, default="http://localhost:8000", help="The URL of the backend")
+    parser.add_argument("--query", type=str, default="What should I wear with my white sneakers?", help="The chat query to send")
+    parser.add_argument("--concurrency", type=int, nargs="*", default=[1, 4, 16], help="The numbers of chats in flight to test")
+    parser.add_argument("--requests", type=int, default=16, help="The number of chats to send per concurrency level")
+    parser.add_argument("--timeout", type=float, default=300.0, help="The timeout of one chat in seconds")
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
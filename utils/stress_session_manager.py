@@ -0,0 +1,154 @@
+"""Hammer SessionManager from many threads and tasks and check no turn is lost or interleaved.
+
+Run from the repository root so the backend package can be imported:
+
+    uv run python -m utils.stress_session_manager --backend sqlite --threads 16
+
+The redis backend runs against an in-process fakeredis server (``uv sync
+--extra redis --extra dev``) unless ``--redis_url`` points at a real one, e.g.
+the ``redis`` service of ``docker compose --profile redis up -d``.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.backend.app.models.schemas import ImageSource
+from src.backend.app.services.session import SessionManager
+from src.backend.app.services.session_store import InMemorySessionStore, RedisSessionStore, SQLiteSessionStore, SessionStore
+
+IMAGE_PATH = "data:image/png;base64,"
+
+
+def run_turns(manager: SessionManager, session_id: str, worker: int, turns: int) -> None:
+    for turn in range(turns):
+        image_id = manager.store_image_source(session_id, ImageSource(path=f"{IMAGE_PATH}{worker}-{turn}", bbox=None))
+        manager.store_message(session_id, user_query=f"{worker}:{turn}", ai_response=f"{worker}:{turn}:{image_id}")
+
+
+def check_history(manager: SessionManager, session_id: str, expected_turns: list[str]) -> list[str]:
+    """Return the problems found in the session: lost turns, duplicates or split user/assistant pairs."""
+    history = manager.load_message_history(session_id)
+    problems = []
+    for user, assistant in zip(history[::2], history[1::2]):
+        if user.role != "user" or assistant.role != "assistant" or not assistant.content.startswith(f"{user.content}:"):
+            problems.append(f"interleaved turn in {session_id}: {user.content!r} / {assistant.content!r}")
+
+    turns = sorted(message.content for message in history[::2])
+    if turns != sorted(expected_turns):
+        problems.append(f"{session_id}: expected {len(expected_turns)} turns, found {len(turns)}")
+
+    image_store = manager.store.get(session_id).image_source_store
+    if len(image_store) != len(expected_turns):
+        problems.append(f"{session_id}: expected {len(expected_turns)} images, found {len(image_store)}")
+    return problems
+
+
+def stress_single_session(manager: SessionManager, threads: int, turns: int) -> dict:
+    session_id = manager.get_or_create_session("stress-single")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        for future in [executor.submit(run_turns, manager, session_id, worker, turns) for worker in range(threads)]:
+            future.result()
+    elapsed = time.perf_counter() - start
+
+    expected = [f"{worker}:{turn}" for worker in range(threads) for turn in range(turns)]
+    return {"turns_per_sec": round(len(expected) / elapsed, 1), "problems": check_history(manager, session_id, expected)}
+
+
+def stress_many_sessions(manager: SessionManager, threads: int, sessions: int, turns: int) -> dict:
+    def run_session(index: int, copy: int) -> None:
+        # two tasks per session, so each session is also contended
+        session_id = manager.get_or_create_session(f"stress-many-{index}")
+        run_turns(manager, session_id, 2 * copy, turns)
+        run_turns(manager, session_id, 2 * copy + 1, turns)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        for future in [executor.submit(run_session, index, copy) for index in range(sessions) for copy in range(2)]:
+            future.result()
+    elapsed = time.perf_counter() - start
+
+    problems = []
+    for index in range(sessions):
+        expected = [f"{worker}:{turn}" for worker in range(4) for turn in range(turns)]
+        problems += check_history(manager, f"stress-many-{index}", expected)
+    return {"turns_per_sec": round(sessions * 4 * turns / elapsed, 1), "problems": problems}
+
+
+async def stress_turns(manager: SessionManager, tasks: int) -> dict:
+    """Concurrent chat turns of one session must not overlap."""
+    session_id = manager.get_or_create_session("stress-turns")
+    active = 0
+    max_active = 0
+
+    async def chat_turn(index: int) -> None:
+        nonlocal active, max_active
+        async with manager.turn(session_id):
+            active += 1
+            max_active = max(max_active, active)
+            history_length = len(manager.load_message_history(session_id))
+            await asyncio.sleep(0.001)
+            await asyncio.to_thread(manager.store_message, session_id, f"turn {index}", f"turn {index}:{history_length}")
+            active -= 1
+
+    await asyncio.gather(*(chat_turn(index) for index in range(tasks)))
+    history = manager.load_message_history(session_id)
+    problems = [] if max_active == 1 else [f"{max_active} turns of one session ran at once"]
+    # every turn must have seen the history left by all turns before it
+    seen = sorted(int(message.content.rsplit(":", 1)[1]) for message in history[1::2])
+    if seen != list(range(0, 2 * tasks, 2)):
+        problems.append("a turn read a stale message history")
+    return {"max_concurrent_turns": max_active, "problems": problems}
+
+
+def create_store(args: argparse.Namespace, directory: str) -> SessionStore:
+    if args.backend == "sqlite":
+        return SQLiteSessionStore(os.path.join(directory, "sessions.db"))
+    if args.backend == "redis":
+        if args.redis_url is not None:
+            store = RedisSessionStore(args.redis_url, key_prefix="stress-session:")
+        else:
+            import fakeredis
+
+            store = RedisSessionStore("", key_prefix="stress-session:", client=fakeredis.FakeRedis())
+        # start from a clean slate when pointed at a shared server
+        for key in store.client.scan_iter(f"{store.key_prefix}*"):
+            store.client.delete(key)
+        return store
+    return InMemorySessionStore(max_sessions=args.sessions + 10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress test SessionManager locking")
+    parser.add_argument("--backend", choices=["memory", "sqlite", "redis"], default="memory", help="The session store to test")
+    parser.add_argument("--redis_url", type=str, default=None, help="The Redis server for --backend redis; fakeredis when not set")
+    parser.add_argument("--threads", type=int, default=16, help="The number of worker threads")
+    parser.add_argument("--turns", type=int, default=50, help="The number of turns per worker")
+    parser.add_argument("--sessions", type=int, default=200, help="The number of sessions in the many-sessions run")
+    parser.add_argument("--tasks", type=int, default=50, help="The number of concurrent chat turns on one session")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        manager = SessionManager(create_store(args, directory))
+
+        report = {
+            "backend": args.backend,
+            "single_session": stress_single_session(manager, args.threads, args.turns),
+            "many_sessions": stress_many_sessions(manager, args.threads, args.sessions, args.turns),
+            "turns": asyncio.run(stress_turns(manager, args.tasks)),
+            "store": manager.store.stats(),
+        }
+        manager.close()
+
+    print(json.dumps(report, indent=2))
+    if any(result.get("problems") for result in report.values() if isinstance(result, dict)):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()